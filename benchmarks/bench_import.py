@@ -0,0 +1,68 @@
+"""
+生成されたモジュールのimport時間を `python -X importtime` で比較する
+
+    python benchmarks/bench_import.py --sections 50 --leaves 20 --repeat 10
+"""
+import os
+import sys
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from argparse import ArgumentParser
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+from configer.command import Configer  # noqa: E402
+
+
+def make_setting(sections: int, leaves: int) -> dict:
+    return {f'section_{i}': {f'leaf_{j}': j for j in range(leaves)} for i in range(sections)}
+
+
+def import_time_us(module_name: str, work_dir: str) -> int:
+    """importtimeの出力から、生成されたモジュールのimportにかかった累積時間 [us] を返す"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([work_dir, str(Path(__file__).parents[1])]))
+    # bytecodeのキャッシュを使う通常のimportを計測する
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        cwd=work_dir, env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        columns = [c.strip() for c in line.split('|')]
+        if len(columns) == 3 and columns[2] == module_name:
+            return int(columns[1])
+    raise RuntimeError(f'{module_name} not found in importtime output')
+
+
+def main():
+    parser = ArgumentParser(description='import time of generated config modules')
+    parser.add_argument('--sections', type=int, default=50)
+    parser.add_argument('--leaves', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            setting_file = Path(tmp_dir) / 'default.yml'
+            setting_file.write_text(yaml.safe_dump(make_setting(args.sections, args.leaves)))
+            print(f'{"runtime":>10} {"lines":>8} {"median [ms]":>12} {"min [ms]":>10}')
+            for runtime in ('embedded', 'shared'):
+                module_name = f'config_{runtime}'
+                out_file = Path(tmp_dir) / f'{module_name}.py'
+                Configer.create_from_file(setting_file, out_file, runtime=runtime)
+                # 1回目はbytecodeのコンパイルを含むので除く
+                import_time_us(module_name, tmp_dir)
+                times = [import_time_us(module_name, tmp_dir) / 1000 for _ in range(args.repeat)]
+                lines = len(out_file.read_text().splitlines())
+                print(f'{runtime:>10} {lines:>8} {statistics.median(times):>12.2f} {min(times):>10.2f}')
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
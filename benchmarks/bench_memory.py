@@ -0,0 +1,88 @@
+"""
+生成されたConfigの1インスタンスあたりのメモリ使用量を比較する
+
+    python benchmarks/bench_memory.py --sections 50 --leaves 20 --instances 2000
+"""
+import os
+import sys
+import gc
+import tempfile
+import tracemalloc
+import importlib.util
+from pathlib import Path
+from argparse import ArgumentParser
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+from configer.command import Configer  # noqa: E402
+
+
+def make_setting(sections: int, leaves: int) -> dict:
+    return {
+        f'section_{i}': {
+            f'leaf_{j}': [j, j + 1] if j % 3 == 0 else (f'value_{j}' if j % 3 == 1 else float(j))
+            for j in range(leaves)
+        } for i in range(sections)
+    }
+
+
+def import_module(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, str(path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(module, override_file: Path, instances: int, intern_values: bool) -> float:
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    configs = [module.ConfigGenerator(assert_identical_to_default=False, intern_values=intern_values)
+               .update_by(override_file)
+               .generate()
+               for _ in range(instances)]
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del configs
+    return (current - start) / instances
+
+
+def main():
+    parser = ArgumentParser(description='memory footprint of generated configs')
+    parser.add_argument('--sections', type=int, default=50)
+    parser.add_argument('--leaves', type=int, default=20)
+    parser.add_argument('--instances', type=int, default=1000)
+    args = parser.parse_args()
+
+    setting = make_setting(args.sections, args.leaves)
+    # 全てのsectionの文字列とtupleを上書きする
+    overrides = {k: {lk: lv for lk, lv in v.items() if not isinstance(lv, float)} for k, v in setting.items()}
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            setting_file = Path(tmp_dir) / 'default.yml'
+            override_file = Path(tmp_dir) / 'override.yml'
+            setting_file.write_text(yaml.safe_dump(setting))
+            override_file.write_text(yaml.safe_dump(overrides))
+
+            variants = [('dict', False)]
+            if sys.version_info >= (3, 10):
+                variants.append(('slots', True))
+            print(f'{"classes":>8} {"intern":>8} {"bytes / instance":>18}')
+            for name, slots in variants:
+                out_file = Path(tmp_dir) / f'config_{name}.py'
+                Configer.create_from_file(setting_file, out_file, slots=slots)
+                module = import_module(f'config_{name}', out_file)
+                for intern_values in (False, True):
+                    per_instance = measure(module, override_file, args.instances, intern_values)
+                    print(f'{name:>8} {str(intern_values):>8} {per_instance:>18,.0f}')
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
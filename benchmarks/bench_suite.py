@@ -0,0 +1,207 @@
+"""
+合成したschemaで生成から読み込み、保存までの各処理の時間とメモリを計測し、JSONのbaselineと比較する
+
+    python benchmarks/bench_suite.py --output baseline.json
+    python benchmarks/bench_suite.py --compare baseline.json --threshold 1.25
+    python benchmarks/bench_suite.py --scenario wide --scenario deep --repeat 3
+"""
+import os
+import sys
+import copy
+import json
+import time
+import platform
+import tempfile
+import statistics
+import tracemalloc
+import importlib.util
+from pathlib import Path
+from argparse import ArgumentParser
+from unittest import mock
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+from configer.command import Configer  # noqa: E402
+from bench_import import import_time_us  # noqa: E402
+
+# name: (depth, width, leaves, list_size, override_files, distinct)
+SCENARIOS = {
+    'small': (2, 3, 8, 0, 2, True),
+    'wide': (1, 200, 20, 0, 8, True),
+    'deep': (6, 3, 5, 0, 4, True),
+    'lists': (1, 10, 5, 5000, 2, True),
+    'shared': (2, 30, 20, 0, 8, False),
+    'many_files': (2, 10, 20, 0, 200, True),
+}
+
+
+def make_setting(depth: int, width: int, leaves: int, list_size: int, distinct: bool = True) -> dict:
+    """
+    各sectionがleaves個の値とwidth個の子sectionを持つ、深さdepthのschemaを作る
+    :param list_size: 0より大きければ各sectionにこの長さのfloatのlistを加える
+    :param distinct: Falseなら同じ深さのsectionを全て同じ構造 (同じdefault値) にする
+    """
+    counter = iter(range(10 ** 9))
+    root = {}
+    stack = [(root, 0)]
+    while stack:
+        section, level = stack.pop()
+        for j in range(leaves):
+            value = next(counter) if distinct else j
+            section[f'leaf_{j}'] = (value, f'name_{value}', value / 2)[j % 3]
+        if list_size > 0:
+            section['weights'] = [0.5] * list_size
+        if level < depth:
+            for i in range(width):
+                child = section[f'child_{i}'] = {}
+                stack.append((child, level + 1))
+    return root
+
+
+def make_overrides(setting: dict, files: int) -> list:
+    """全てのleaf (listを除く) をfiles個のファイルに重複なく割り振った上書きを作る"""
+    overrides = [{} for _ in range(files)]
+    stack = [((), setting)]
+    index = 0
+    while stack:
+        keys, section = stack.pop()
+        for k, v in section.items():
+            if isinstance(v, dict):
+                stack.append((keys + (k,), v))
+                continue
+            if isinstance(v, list):
+                continue
+            node = overrides[index % files]
+            for key in keys:
+                node = node.setdefault(key, {})
+            node[k] = v + 1 if not isinstance(v, str) else v + '_override'
+            index += 1
+    return [override for override in overrides if len(override) > 0]
+
+
+def measure(func, repeat: int) -> dict:
+    """repeat回実行した時間の中央値と最小値 [ms]、1回目のメモリのピーク [KiB] を返す"""
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': statistics.median(times), 'min_ms': min(times), 'peak_kib': peak / 1024}
+
+
+def import_module(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, str(path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_scenario(name: str, work_dir: Path, repeat: int) -> dict:
+    depth, width, leaves, list_size, files, distinct = SCENARIOS[name]
+    setting = make_setting(depth, width, leaves, list_size, distinct)
+    setting_file = work_dir / f'{name}.yml'
+    setting_file.write_text(yaml.safe_dump(setting))
+    override_files = []
+    for i, override in enumerate(make_overrides(setting, files)):
+        override_file = work_dir / f'{name}_override_{i}.yml'
+        override_file.write_text(yaml.safe_dump(override))
+        override_files.append(override_file)
+    module_name = f'config_{name}'
+    out_file = work_dir / f'{module_name}.py'
+
+    results = {'create_from_file': measure(lambda: Configer.create_from_file(setting_file, out_file), repeat)}
+    results['create_from_file']['lines'] = len(out_file.read_text().splitlines())
+    # 1回目はbytecodeのコンパイルを含むので除く
+    import_time_us(module_name, str(work_dir))
+    import_times = [import_time_us(module_name, str(work_dir)) / 1000 for _ in range(repeat)]
+    results['import'] = {'median_ms': statistics.median(import_times), 'min_ms': min(import_times)}
+
+    module = import_module(module_name, out_file)
+    generator = module.ConfigGenerator
+    results['generate'] = measure(lambda: generator().generate(), repeat)
+    results['update_by'] = measure(lambda: generator().update_by(override_files), repeat)
+    loaded = [(file, module._load_override_file(file)[0]) for file in override_files]
+    # マージ結果は入力の辞書を共有するので、毎回別のコピーを渡す
+    copies = iter([copy.deepcopy(loaded) for _ in range(repeat + 1)])
+    results['_safe_file_merge'] = measure(lambda: generator._safe_file_merge(next(copies)), repeat)
+
+    config = generator().update_by(override_files).generate()
+    with mock.patch('clint.textui.puts'):
+        results['pprint'] = measure(lambda: config.pprint(wait=False), repeat)
+    if list_size == 0:
+        # yaml.safe_dump はtupleを扱えないのでlistを含むschemaでは計測しない
+        results['save_as_yaml'] = measure(lambda: config.save_as(work_dir / 'saved.yml', 'yaml'), repeat)
+    results['save_as_binary'] = measure(lambda: config.save_as(work_dir / 'saved.bin', 'binary'), repeat)
+    results['load_snapshot'] = measure(lambda: generator().load_snapshot(work_dir / 'saved.bin'), repeat)
+    return results
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_ms: float) -> list:
+    """
+    baselineのthreshold倍を超えた (scenario, 処理, 指標, baseline, 今回) のリストを返す
+    :param min_ms: 時間の差がこれ以下なら計測誤差とみなす
+    """
+    regressions = []
+    for scenario, cases in current['results'].items():
+        for case, result in cases.items():
+            previous = baseline['results'].get(scenario, {}).get(case)
+            if previous is None:
+                continue
+            if result['median_ms'] > previous['median_ms'] * threshold \
+                    and result['median_ms'] - previous['median_ms'] > min_ms:
+                regressions.append((scenario, case, 'median_ms', previous['median_ms'], result['median_ms']))
+            if 'peak_kib' in result and 'peak_kib' in previous \
+                    and result['peak_kib'] > previous['peak_kib'] * threshold:
+                regressions.append((scenario, case, 'peak_kib', previous['peak_kib'], result['peak_kib']))
+    return regressions
+
+
+def main():
+    parser = ArgumentParser(description='benchmark suite of configer')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenarios to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', type=str, default=None, help='write results as json (baseline)')
+    parser.add_argument('--compare', type=str, default=None, help='baseline json to compare with')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='flag cases slower (or larger) than baseline * threshold as regressions')
+    parser.add_argument('--min-ms', type=float, default=0.5,
+                        help='ignore time differences smaller than this')
+    args = parser.parse_args()
+
+    current = {'python': platform.python_version(), 'platform': platform.platform(), 'results': {}}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            print(f'{"scenario":>12} {"case":>18} {"median [ms]":>12} {"min [ms]":>10} {"peak [KiB]":>12}')
+            for name in args.scenario or list(SCENARIOS):
+                results = run_scenario(name, Path(tmp_dir), args.repeat)
+                current['results'][name] = results
+                for case, result in results.items():
+                    peak = f'{result["peak_kib"]:>12,.0f}' if 'peak_kib' in result else f'{"-":>12}'
+                    print(f'{name:>12} {case:>18} {result["median_ms"]:>12.2f} {result["min_ms"]:>10.2f} {peak}')
+        finally:
+            os.chdir(cwd)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold, args.min_ms)
+        for scenario, case, metric, previous, result in regressions:
+            print(f'REGRESSION {scenario} {case} {metric}: {previous:,.2f} -> {result:,.2f} ({result / previous:.2f}x)')
+        if len(regressions) > 0:
+            sys.exit(1)
+        print(f'no regressions (threshold {args.threshold:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,17 @@
+import os
+import contextlib
+from functools import lru_cache
 from pathlib import Path
 from argparse import ArgumentParser
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-import toml
 import yaml
 from clint.textui import colored, puts
 from prestring import output as prestring_output
 
 from .config_parser import ConfigParser
-from .template.template import generate
-from .template.utils import hash_md5
+from .template.template import generate, included_lines
+from .template.utils import fingerprint_cache, load_setting_file, ParsedFileCache
 
 
 lock_file_path = Path('.config.lock')
@@ -22,22 +25,36 @@ class Configer:
         :return: dict パースされた辞書データ
         """
         assert setting_file_path.is_file(), setting_file_path
-        if setting_file_path.suffix == '.toml':
-            with setting_file_path.open('r') as f:
-                setting = toml.load(f)
-        elif setting_file_path.suffix == '.yaml' or setting_file_path.suffix == '.yml':
-            with setting_file_path.open('r') as f:
-                setting = yaml.safe_load(f)
-        else:
-            raise RuntimeError('Not support type (Toml / Yaml)')
-        return setting
+        return load_setting_file(setting_file_path, ParsedFileCache.from_env())
 
     @staticmethod
     def create(args):
         """create template.py form default.toml and generate template.py"""
-        setting_file = args.setting
-        output_file = args.output
-        Configer.create_from_file(Path(setting_file), Path(output_file))
+        pairs = [(Path(setting), Path(output)) for setting, output in args.pair or []]
+        if args.manifest is not None:
+            pairs.extend(Configer.load_manifest(Path(args.manifest)))
+        if len(pairs) == 0:
+            pairs.append((Path(args.setting), Path(args.output)))
+        options = {'slots': args.slots, 'lazy': args.lazy, 'runtime': args.runtime}
+        results = Configer.create_many(
+            [(setting, output, args.hash_algorithm, options) for setting, output in pairs],
+            max_workers=args.jobs, force=args.force)
+        for setting, created in results:
+            if created:
+                puts(colored.yellow(f'Created {setting}'))
+            else:
+                puts(colored.green(f'No changes in {setting}'))
+
+    @staticmethod
+    def load_manifest(manifest_path: Path) -> List[Tuple[Path, Path]]:
+        """
+        :param manifest_path: {設定ファイル: 出力先} の辞書、または {setting: 設定ファイル, output: 出力先} のリストを書いたファイル
+        :return: (設定ファイル, 出力先) のリスト
+        """
+        manifest = Configer.load_setting(manifest_path)
+        if isinstance(manifest, dict):
+            return [(Path(setting), Path(output)) for setting, output in manifest.items()]
+        return [(Path(entry['setting']), Path(entry['output'])) for entry in manifest]
 
     @staticmethod
     def update(args):
@@ -46,55 +63,310 @@ class Configer:
             print("You should create template.py from default.toml")
             exit()
 
-        with lock_file_path.open('r') as f:
-            registered_setting_files = yaml.safe_load(f)
-            for registered_setting_file, contents in registered_setting_files.items():
-                previous_hash = contents['hash_value']
-                output_file = contents['output']
+        jobs = [(Path(registered_setting_file), Path(contents['output']), contents.get('hash_algorithm', 'md5'),
+                 contents.get('options', {}))
+                for registered_setting_file, contents in read_lock().items()]
+        for setting, created in Configer.create_many(jobs):
+            if created:
+                puts(colored.yellow(f'Updated {setting}'))
+            else:
+                puts(colored.green(f'No changes in {setting}'))
 
-                current_hash = hash_md5(Path(registered_setting_file))
+    @staticmethod
+    def validate(args):
+        """上書きファイルを生成済みのschemaで検査し、結果を完了順に表示して最後にJSONで集計を出力する"""
+        import sys
+        import json
 
-                if current_hash != previous_hash:
-                    Configer.create_from_file(Path(registered_setting_file), Path(output_file))
-                    puts(colored.yellow(f'Updated {registered_setting_file}'))
-                else:
-                    puts(colored.green(f'No changes in {registered_setting_file}'))
+        groups = [[Path(file) for file in arg.split(',')] for arg in args.files]
+        # 同じグループが複数回指定されても検査ごとに数える
+        failed = []
+        for group, errors in Configer.validate_files(Path(args.schema), groups, max_workers=args.jobs):
+            name = ','.join(map(str, group))
+            if len(errors) == 0:
+                puts(colored.green(f'OK {name}'))
+                continue
+            failed.append({'group': name, 'errors': errors})
+            puts(colored.red(f'NG {name}'))
+            for error in errors:
+                puts(f'  {error}')
+        print(json.dumps({'checked': len(groups), 'passed': len(groups) - len(failed), 'failed': len(failed),
+                          'errors': failed}, ensure_ascii=False))
+        if len(failed) > 0:
+            sys.exit(1)
 
     @staticmethod
-    def create_from_file(setting_file_path: Path, output_file_path: Path):
-        assert setting_file_path.is_file(), setting_file_path
+    def validate_files(schema_path: Path, groups: List[List[Path]], max_workers: Optional[int] = None,
+                       chunk_size: int = 16) -> Iterator[Tuple[List[Path], List[str]]]:
+        """
+        :param schema_path: 生成したPythonスクリプト、またはdefault値の設定ファイル
+        :param groups: 同時にupdate_byに渡すファイルのリストのリスト. グループ内のファイル間の衝突も調べる
+        :param max_workers: プロセス数. 1なら同じプロセスで検査する
+        :param chunk_size: 1つのタスクで検査するグループ数
+        :return: 検査が終わった順に (グループ, エラーメッセージのリスト)
+        """
+        chunks = [groups[i:i + chunk_size] for i in range(0, len(groups), chunk_size)]
+        if len(chunks) < 2 or max_workers == 1:
+            schema = load_schema(schema_path)
+            for group in groups:
+                yield group, check_overrides(schema, group)
+            return
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers, initializer=_init_validate_worker, initargs=(schema_path,)) as executor:
+            futures = [executor.submit(_validate_groups, chunk) for chunk in chunks]
+            for future in concurrent.futures.as_completed(futures):
+                yield from future.result()
 
-        template_file = Path(__file__).parent / 'template' / 'template.py'
-        assert template_file.is_file(), str(template_file)
-
-        # Load Setting
-        config_parser = ConfigParser()
-        setting = Configer.load_setting(setting_file_path)
-        params = [config_parser.parse(k, v, parent_class_name=None) for k, v in setting.items()]
-        # Render
-        config_string = generate(
-            list(config_parser.dataclasses.values()),
-            params,
-            str(setting_file_path),
-            hash_md5(setting_file_path))
-        with prestring_output.output(root=output_file_path.parent) as fs:
-            with fs.open(str(output_file_path.name), 'w') as wf:
-                print(config_string, file=wf)
-
-        # Log
-        if lock_file_path.is_file():
-            with open(lock_file_path, 'r') as f:
-                current_contents = yaml.safe_load(f)
-                if not isinstance(current_contents, dict):
-                    current_contents = {}
+    @staticmethod
+    def create_many(jobs: List[Tuple[Path, Path, str, Dict[str, Any]]], max_workers: Optional[int] = None,
+                    force: bool = False) -> List[Tuple[Path, bool]]:
+        """
+        複数の設定ファイルからまとめて生成し、.config.lock を一度だけ書き換える
+        設定ファイルのhash、option、configer自身がlockの記録と一致し、出力が存在するものは生成しない
+        :param jobs: (設定ファイル, 出力先, hash_algorithm, create_from_fileのoption) のリスト
+        :param max_workers: 2つ以上生成する場合のプロセス数. Noneならos.cpu_count()
+        :param force: Trueなら変更が無くても生成する
+        :return: (設定ファイル, 生成したかどうか) のリスト
+        """
+        registered = read_lock()
+        generator_hash = template_hash()
+        todo = []
+        for setting_file_path, output_file_path, hash_algorithm, options in jobs:
+            assert setting_file_path.is_file(), setting_file_path
+            contents = registered.get(str(setting_file_path))
+            if not force and contents is not None and output_file_path.is_file() \
+                    and contents['output'] == str(output_file_path) \
+                    and contents.get('hash_algorithm', 'md5') == hash_algorithm \
+                    and contents.get('options', {}) == options \
+                    and contents.get('generator') == generator_hash:
+                # lockに記録したstatが一致すればファイル全体の再hashを省略する
+                if 'fingerprint' in contents:
+                    fingerprint_cache.seed(
+                        setting_file_path, contents['fingerprint'], hash_algorithm, contents['hash_value'])
+                if fingerprint_cache.digest(setting_file_path, hash_algorithm) == contents['hash_value']:
+                    continue
+            todo.append((setting_file_path, output_file_path, hash_algorithm, options))
+
+        if len(todo) < 2 or max_workers == 1:
+            entries = [_render(*job) for job in todo]
         else:
-            current_contents = {}
-        with open(lock_file_path, 'w') as f:
-            current_contents[str(setting_file_path)] = {
-                    'hash_value': hash_md5(setting_file_path),
-                    'output': str(output_file_path)
-                }
-            yaml.safe_dump(current_contents, f)
+            import concurrent.futures
+            with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+                entries = list(executor.map(_render, *zip(*todo)))
+        if len(entries) > 0:
+            update_lock(dict(entries))
+        created = {job[0] for job in todo}
+        return [(job[0], job[0] in created) for job in jobs]
+
+    @staticmethod
+    def create_from_file(setting_file_path: Path, output_file_path: Path, hash_algorithm: str = 'md5',
+                         slots: bool = False, lazy: bool = False, runtime: str = 'embedded'):
+        """
+        :param setting_file_path: default値を記述した設定ファイル
+        :param output_file_path: 生成するPythonスクリプト
+        :param hash_algorithm: 設定ファイルの変更検出に使うhash
+        :param slots: __slots__を持つdataclassを生成する (Python 3.10以降)
+        :param lazy: 子要素のdataclassを初めて参照されたときに作る
+        :param runtime: 'shared' なら共通処理を埋め込まずに configer.runtime からimportする
+        """
+        update_lock(dict([_render(setting_file_path, output_file_path, hash_algorithm,
+                                  {'slots': slots, 'lazy': lazy, 'runtime': runtime})]))
+
+
+def _render(setting_file_path: Path, output_file_path: Path, hash_algorithm: str, options: Dict[str, Any]) \
+        -> Tuple[str, Dict[str, Any]]:
+    """
+    設定ファイルからPythonスクリプトを生成する. create_many から別プロセスで呼ばれる
+    :return: (設定ファイル, .config.lock に記録する内容)
+    """
+    assert setting_file_path.is_file(), setting_file_path
+
+    template_file = Path(__file__).parent / 'template' / 'template.py'
+    assert template_file.is_file(), str(template_file)
+
+    config_string, setting_hash = _render_source(setting_file_path, hash_algorithm, options)
+    with prestring_output.output(root=output_file_path.parent) as fs:
+        with fs.open(str(output_file_path.name), 'w') as wf:
+            print(config_string, file=wf)
+
+    contents = {
+        'hash_value': setting_hash,
+        'hash_algorithm': hash_algorithm,
+        'options': options,
+        'output': str(output_file_path),
+        'generator': template_hash()
+    }
+    setting_stat = fingerprint_cache.trusted_stat(setting_file_path)
+    if setting_stat is not None:
+        contents['fingerprint'] = list(setting_stat)
+    return str(setting_file_path), contents
+
+
+def _render_source(setting_file_path: Path, hash_algorithm: str, options: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    :return: (生成したPythonスクリプト, 設定ファイルのhash)
+    """
+    # Load Setting
+    config_parser = ConfigParser(slots=options.get('slots', False), lazy=options.get('lazy', False))
+    setting = Configer.load_setting(setting_file_path)
+    params = [config_parser.parse(k, v, parent_class_name=None) for k, v in setting.items()]
+    config_parser.make_validator('_Config', setting)
+    setting_hash = fingerprint_cache.digest(setting_file_path, hash_algorithm)
+    # Render
+    config_string = generate(
+        list(config_parser.dataclasses.values()),
+        params,
+        str(setting_file_path),
+        setting_hash,
+        hash_algorithm,
+        list(config_parser.validators.values()),
+        config_parser.make_path_table(setting),
+        config_parser.make_methods('_Config', setting),
+        config_parser.dataclass_decorator,
+        options.get('runtime', 'embedded'))
+    return str(config_string), setting_hash
+
+
+def load_schema(schema_path: Path) -> Dict[str, Tuple[str, Any, Any, Any]]:
+    """
+    生成したPythonスクリプト、またはdefault値の設定ファイルから _PATH_TABLE を得る
+    設定ファイルの場合はファイルに書き出さずにメモリ上で生成する
+    """
+    import sys
+    import types
+    import importlib.util
+
+    module_name = '_configer_schema'
+    if schema_path.suffix == '.py':
+        spec = importlib.util.spec_from_file_location(module_name, str(schema_path))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        source, _ = _render_source(schema_path, 'md5', {})
+        module = types.ModuleType(module_name)
+        sys.modules[module_name] = module
+        try:
+            exec(compile(source, str(schema_path), 'exec'), module.__dict__)
+        finally:
+            del sys.modules[module_name]
+    return module._PATH_TABLE
+
+
+# validateの各プロセスで一度だけ読み込むschema
+_validate_schema: Optional[Dict[str, Tuple[str, Any, Any, Any]]] = None
+
+
+def _init_validate_worker(schema_path: Path):
+    global _validate_schema
+    _validate_schema = load_schema(schema_path)
+
+
+def _validate_groups(groups: List[List[Path]]) -> List[Tuple[List[Path], List[str]]]:
+    return [(group, check_overrides(_validate_schema, group)) for group in groups]
+
+
+def check_overrides(schema: Dict[str, Tuple[str, Any, Any, Any]], files: List[Path]) -> List[str]:
+    """
+    update_by(files) と同じ読み込み方で、未定義のキー、型の不一致、ファイル間の衝突を全て調べる
+    :param schema: 生成したPythonスクリプトの _PATH_TABLE
+    :param files: 同時に update_by に渡すファイル
+    :return: エラーメッセージのリスト (問題が無ければ空)
+    """
+    from .template.core import _KeyTrie, _get_items, _invalid_type_error, _load_override_file
+    from .template.errors import ConflictError
+
+    errors = []
+    key_trie = _KeyTrie()
+    conflicts = []
+    for file in files:
+        try:
+            params, keys = _load_override_file(file)
+        except Exception as e:
+            errors.append(f'{file}: {e}')
+            continue
+        conflicts.extend(key_trie.insert(params, file))
+        origins = dict.fromkeys(keys, file)
+        for key, value in _get_items(params):
+            if key not in schema:
+                errors.append(f'キー {key} が定義されていません (set by {file})')
+                continue
+            type_name, check, _, _ = schema[key]
+            if not check(value):
+                errors.append(str(_invalid_type_error(key, type_name, value, origins)))
+    if len(conflicts) > 0:
+        errors.append(str(ConflictError(*conflicts)))
+    return errors
+
+
+@lru_cache(maxsize=None)
+def template_hash() -> str:
+    """生成に使うテンプレートのhash. configerが更新された場合は変更のない設定ファイルも生成し直す"""
+    import hashlib
+
+    hasher = hashlib.blake2b(digest_size=16)
+    template_dir = Path(__file__).parent / 'template'
+    for path in sorted(template_dir.glob('*.py')) + [Path(__file__).parent / 'config_parser.py']:
+        hasher.update(''.join(included_lines(path)).encode())
+    return hasher.hexdigest()
+
+
+def read_lock() -> Dict[str, Dict[str, Any]]:
+    if not lock_file_path.is_file():
+        return {}
+    with lock_file_path.open('r') as f:
+        contents = yaml.safe_load(f)
+    return contents if isinstance(contents, dict) else {}
+
+
+def update_lock(entries: Dict[str, Dict[str, Any]]):
+    """
+    .config.lock にentriesを追記する. 複数のconfigerが同時に書き換えても壊れないよう、
+    lockのあるディレクトリをflockしてから読み直し、一時ファイルを os.replace で置き換える
+    """
+    import tempfile
+
+    lock_dir = lock_file_path.absolute().parent
+    with _advisory_lock(lock_dir):
+        current_contents = read_lock()
+        current_contents.update(entries)
+        fd, tmp_path = tempfile.mkstemp(dir=str(lock_dir), prefix=f'{lock_file_path.name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                yaml.safe_dump(current_contents, f)
+            # mkstemp は0600で作るので、置き換え前に既存のlock (無ければumask) と同じ権限にする
+            os.chmod(tmp_path, _lock_file_mode())
+            os.replace(tmp_path, str(lock_file_path))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def _lock_file_mode() -> int:
+    import stat
+
+    if lock_file_path.is_file():
+        return stat.S_IMODE(lock_file_path.stat().st_mode)
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+@contextlib.contextmanager
+def _advisory_lock(directory: Path):
+    try:
+        import fcntl
+    except ImportError:
+        # fcntlの無い環境 (Windows) ではロックしない
+        yield
+        return
+    fd = os.open(str(directory), os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
 
 
 def get_arg_parser():
@@ -108,10 +380,38 @@ def get_arg_parser():
         '-s', '--setting', required=False, type=str, help='path to setting file [toml]', default='setting/default.toml')
     config_create.add_argument(
         '-o', '--output', required=False, type=str, help='path to output config file [python]', default='template.py')
+    config_create.add_argument(
+        '--hash-algorithm', required=False, type=str, help='digest used to detect changes of the setting file',
+        default='md5', choices=['md5', 'sha1', 'sha256', 'blake2b'])
+    config_create.add_argument(
+        '--slots', action='store_true', help='generate dataclasses with __slots__ (requires Python 3.10+)')
+    config_create.add_argument(
+        '--lazy', action='store_true', help='build nested sections on first attribute access')
+    config_create.add_argument(
+        '--runtime', required=False, type=str, default='embedded', choices=['embedded', 'shared'],
+        help='embed the runtime into the output file, or import it from configer.runtime')
+    config_create.add_argument(
+        '--pair', nargs=2, action='append', metavar=('SETTING', 'OUTPUT'),
+        help='setting file and output file (can be given many times, overrides -s / -o)')
+    config_create.add_argument(
+        '--manifest', required=False, type=str, help='yaml / toml file mapping setting files to output files')
+    config_create.add_argument(
+        '-j', '--jobs', required=False, type=int, default=None, help='number of processes to generate files')
+    config_create.add_argument(
+        '--force', action='store_true', help='regenerate outputs even if the setting files have not changed')
     config_create.set_defaults(handler=Configer.create)
 
     config_update = subparsers.add_parser('update', help='update your config file [python]')
     config_update.set_defaults(handler=Configer.update)
+
+    config_validate = subparsers.add_parser('validate', help='check override files against a generated config')
+    config_validate.add_argument(
+        '-s', '--schema', required=True, type=str, help='generated config file [python] or default setting file')
+    config_validate.add_argument(
+        'files', nargs='+', help='override files. files joined by "," are checked together for conflicts')
+    config_validate.add_argument(
+        '-j', '--jobs', required=False, type=int, default=None, help='number of processes to check files')
+    config_validate.set_defaults(handler=Configer.validate)
     return parser
 
 
@@ -1,11 +1,24 @@
 from collections import OrderedDict
-from typing import Any, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 
 class ConfigParser:
-    def __init__(self):
+    # 同じ型の要素がこの数以上並ぶlistは要素ごとではなく typing.Tuple[T, ...] として扱う
+    variadic_threshold = 8
+
+    def __init__(self, slots: bool = False, lazy: bool = False):
+        """
+        :param slots: Trueなら __slots__ を持つdataclassを生成し、インスタンスごとの__dict__を無くす (Python 3.10以降)
+        :param lazy: Trueなら子要素のdataclassを__post_init__で作らず、初めて参照されたときに作る
+        """
+        self.slots = slots
+        self.lazy = lazy
         self.dataclasses = OrderedDict()
-        self.post_inits = []
+        self.validators = OrderedDict()
+        # 辞書のid -> (辞書, クラス名). 辞書を保持してidの再利用を防ぐ
+        self._class_names: Dict[int, Tuple[dict, str]] = {}
+        # 部分木の構造 ((キー, 型名, default値), ...) -> クラス名
+        self._shapes: Dict[Tuple[Tuple[str, str, str], ...], str] = {}
 
     def get_type_and_default(self, value: Any, this_class_name: Optional[str] = None,
                              parent_class_name: Optional[str] = None) \
@@ -19,7 +32,10 @@ class ConfigParser:
         """
 
         # List, Tuple
-        # Tupleとして保存し、各要素の型を記述する
+        # Tupleとして保存し、各要素の型を記述する. 長く同じ型が並ぶ場合は要素の型を一度だけ記述する
+        element_type = self.variadic_type(value)
+        if element_type is not None:
+            return f'typing.Tuple[{element_type.__name__}, ...]', repr(tuple(value))
         if isinstance(value, list) or isinstance(value, tuple):
             keys_and_defaults = [self.get_type_and_default(v, this_class_name) for v in value]
             key_type = f'typing.Tuple[{", ".join([k for k, d in keys_and_defaults])}]'
@@ -29,12 +45,13 @@ class ConfigParser:
 
         # Dict
         # 新たなdataclassとして新規クラス名を作成する
-        # 作成の際は親要素のクラス名をprefixにし、重複を防ぐ
+        # 作成の際は親要素のクラス名をprefixにし、重複を防ぐ. 同じ構造の部分木には既存のクラス名を返す
         if isinstance(value, dict):
-            if parent_class_name is None:
-                self.make_dataclass_from_dict(this_class_name, value)
-                parent_class_name = ''
-            return parent_class_name + this_class_name, None
+            registered = self._class_names.get(id(value))
+            if registered is not None:
+                return registered[1], None
+            prefix = '' if parent_class_name is None else parent_class_name
+            return self.make_dataclass_from_dict(prefix + this_class_name, value), None
 
         # primitive types
         # Python表記に直していく
@@ -65,35 +82,262 @@ class ConfigParser:
         key_class_name = self.to_class_name(key_name)
         key_type_name, default_value = self.get_type_and_default(value, key_class_name, parent_class_name)
         if default_value is None:
-            self.post_inits.append(f"super().__setattr__('{key_name}', {key_type_name}())")
             return f'{key_name}: {key_type_name} = dataclasses.field(init=False)'
         return f'{key_name}: {key_type_name} = {default_value}'
 
-    def make_dataclass_from_dict(self, class_name: str, class_setting_values: dict) -> None:
-        # _dictのvalueにdictの型が存在しなくなるまで掘っていく
+    def make_dataclass_from_dict(self, class_name: str, class_setting_values: dict) -> str:
+        """
+        class_setting_values以下の全ての辞書からdataclassを生成し、class_setting_valuesのクラス名を返す
+        再帰せずに明示的なstackで帰りがけ順 (子のクラスが先) に辿り、
+        同じ構造 (キー, 型名, default値) の部分木には1つのクラスを共有させる
+        :param class_name: class_setting_valuesに新しいクラスを作る場合の名前
+        :param class_setting_values:
+        :return:
+        """
+        stack = [(class_name, class_setting_values, False)]
+        while stack:
+            name, values, children_done = stack.pop()
+            if id(values) in self._class_names:
+                continue
+            if not children_done:
+                stack.append((name, values, True))
+                stack.extend([(name + self.to_class_name(k), v, False)
+                              for k, v in reversed(list(values.items())) if isinstance(v, dict)])
+                continue
+            shape = tuple([(k,) + tuple(map(repr, self.get_type_and_default(v, self.to_class_name(k), name)))
+                           for k, v in values.items()])
+            if shape not in self._shapes:
+                # 構造の異なるクラスと名前が衝突した場合は連番を付ける
+                unique_name, number = name, 1
+                while unique_name in self.dataclasses:
+                    number += 1
+                    unique_name = f'{name}{number}'
+                self._shapes[shape] = unique_name
+                self._class_names[id(values)] = (values, unique_name)
+                self.dataclasses[unique_name] = self.make_class_def(unique_name, values)
+                self.make_validator(unique_name, values, unique_name)
+            self._class_names[id(values)] = (values, self._shapes[shape])
+        return self._class_names[id(class_setting_values)][1]
+
+    def make_class_def(self, class_name: str, class_setting_values: dict) -> str:
+        """
+        子要素のクラスが登録済みの辞書からdataclassの定義を生成する
+        """
+        indent = "    "
+        members = [self.parse(k, v, parent_class_name=class_name) for k, v in class_setting_values.items()]
+        members = f'\n{indent}'.join(members)
+        methods = '\n'.join([f'{indent}{line}' if line else line
+                             for line in self.make_methods(class_name, class_setting_values, class_name)])
+        return f"{self.dataclass_decorator}\n" \
+               f"class {class_name}:\n" \
+               f"{indent}{members}\n\n" \
+               f"{methods}"
+
+    def make_methods(self, class_name: str, class_setting_values: dict, child_class_prefix: str = '') -> List[str]:
+        """
+        dataclassのfield以外の部分 (__post_init__ または __getattr__、_from_dict) を生成する (行ごとに返す)
+        :param class_name: dataclassの名前
+        :param class_setting_values: dataclassの元になった辞書
+        :param child_class_prefix: 子要素のdataclass名のprefix (トップレベルの場合は空文字)
+        :return:
+        """
+        indent = "    "
+        methods = []
+        children = [(k, self.get_type_and_default(v, self.to_class_name(k), child_class_prefix)[0])
+                    for k, v in class_setting_values.items() if isinstance(v, dict)]
+        if len(children) > 0 and self.lazy:
+            methods.extend(self.make_lazy_fields(class_name, class_setting_values, child_class_prefix) + [''])
+        elif len(children) > 0:
+            methods.append('def __post_init__(self):')
+            # slots=Trueのdataclassでは引数なしのsuper()が使えないのでobjectのメソッドを直接呼ぶ
+            methods.extend([f"{indent}object.__setattr__(self, '{k}', {child_class_name}())"
+                            for k, child_class_name in children])
+            methods.append('')
+        methods.extend(self.make_from_dict(class_name, class_setting_values, child_class_prefix))
+        return methods
+
+    def make_lazy_fields(self, class_name: str, class_setting_values: dict, child_class_prefix: str = '') \
+            -> List[str]:
+        """
+        lazyモードで子要素のdataclassを初めて参照されたときに作る __getattr__ を生成する (行ごとに返す)
+        ex)
+        make_lazy_fields('Models', {'base_mlp': {...}}, 'Models') =
+        _lazy_fields = {'base_mlp': ModelsBaseMlp}
+
+        def __getattr__(self, name):
+            return _materialize(self, name)
+        """
+        indent = "    "
+        lazy_fields = ', '.join([
+            f"'{k}': {self.get_type_and_default(v, self.to_class_name(k), child_class_prefix)[0]}"
+            for k, v in class_setting_values.items() if isinstance(v, dict)])
+        return [f'_lazy_fields = {{{lazy_fields}}}',
+                '',
+                'def __getattr__(self, name):',
+                f'{indent}return _materialize(self, name)']
+
+    def make_from_dict(self, class_name: str, class_setting_values: dict, child_class_prefix: str = '') \
+            -> List[str]:
+        """
+        上書きする値の辞書から一度でインスタンスを作る _from_dict を生成する (class内にインデントせずに行ごとに返す)
+        default値で作ってから object.__setattr__ で書き換えるのに比べ、上書きされた部分木を二重に作らずに済む
+        ex)
+        make_from_dict('Training', {'batchsize': 64}, 'Training') =
+        _field_names = frozenset({'batchsize'})
+
+        @classmethod
+        def _from_dict(cls, d, path=''):
+            _check_unknown_keys(cls, d, path)
+            self = object.__new__(cls)
+            object.__setattr__(self, 'batchsize', d.get('batchsize', 64))
+            return self
+        :param class_name: dataclassの名前
+        :param class_setting_values: dataclassの元になった辞書
+        :param child_class_prefix: 子要素のdataclass名のprefix (トップレベルの場合は空文字)
+        :return:
+        """
+        indent = "    "
+        field_names = ', '.join([f"'{k}'" for k in class_setting_values])
+        lines = [f'_field_names = frozenset({{{field_names}}})',
+                 '',
+                 '@classmethod',
+                 'def _from_dict(cls, d, path=\'\'):',
+                 f'{indent}_check_unknown_keys(cls, d, path)',
+                 f'{indent}self = object.__new__(cls)']
         for k, v in class_setting_values.items():
+            key_type_name, default_value = self.get_type_and_default(v, self.to_class_name(k), child_class_prefix)
+            if isinstance(v, dict) and self.lazy:
+                # 上書きされていない部分木は参照されるまで作らない
+                lines.append(f"{indent}if '{k}' in d:")
+                lines.append(f"{indent}{indent}object.__setattr__(self, '{k}', "
+                             f"_build_child({key_type_name}, d, '{k}', path))")
+            elif isinstance(v, dict):
+                lines.append(f"{indent}object.__setattr__(self, '{k}', _build_child({key_type_name}, d, '{k}', path))")
+            else:
+                lines.append(f"{indent}object.__setattr__(self, '{k}', d.get('{k}', {default_value}))")
+        lines.append(f'{indent}return self')
+        return lines
+
+    def make_validator(self, class_name: str, class_setting_values: dict, child_class_prefix: str = '') -> str:
+        """
+        dataclassの各fieldの型を確認する関数を生成する. 実行時にdataclasses.fieldsなどを参照せずに済む
+        ex)
+        make_validator('Training', {'batchsize': 64}, 'Training') =
+        def _validate_Training(obj, path, origins):
+            value = obj.batchsize
+            if type(value) is not int:
+                raise _invalid_type_error(path + '/batchsize', 'int', value, origins)
+        :param class_name: 検査するdataclassの名前
+        :param class_setting_values: dataclassの元になった辞書
+        :param child_class_prefix: 子要素のdataclass名のprefix (トップレベルの場合は空文字)
+        :return:
+        """
+        indent = "    "
+        lines = [f'def _validate_{class_name}(obj, path, origins):']
+        for k, v in class_setting_values.items():
+            key_type_name, _ = self.get_type_and_default(v, self.to_class_name(k), child_class_prefix)
+            raise_error = f'raise _invalid_type_error(path + \'/{k}\', \'{key_type_name}\', value, origins)'
             if isinstance(v, dict):
-                self.make_dataclass_from_dict(class_name + self.to_class_name(k), v)
-        # _dictのkeyとvalueからdataclassを生成する
-        self.post_inits.clear()
-        members = [self.parse(k, v, parent_class_name=class_name) for k, v in class_setting_values.items()]
+                # lazyモードでまだ作られていない部分木はdefault値なので検査しない
+                block_indent = indent * 2 if self.lazy else indent
+                if self.lazy:
+                    lines.append(f'{indent}if _is_materialized(obj, \'{k}\'):')
+                lines.append(f'{block_indent}value = obj.{k}')
+                lines.append(f'{block_indent}if type(value) is not {key_type_name}:')
+                lines.append(f'{block_indent}{indent}{raise_error}')
+                lines.append(f'{block_indent}_validate_{key_type_name}(value, path + \'/{k}\', origins)')
+            else:
+                lines.append(f'{indent}value = obj.{k}')
+                lines.append(f'{indent}if {self.check_expression(v, "value", negate=True)}:')
+                lines.append(f'{indent}{indent}{raise_error}')
+        if len(class_setting_values) == 0:
+            lines.append(f'{indent}pass')
+        validator = '\n'.join(lines)
+        self.validators[class_name] = validator
+        return validator
+
+    def make_path_table(self, setting: dict) -> str:
+        """
+        全てのキーのpathから (型名, 型を確認する関数, 値を取り出す関数, default値) への表 _PATH_TABLE を生成する
+        上書きされたキーの検査や Config.get で使う. dataclassのdefault値は dataclasses.MISSING とする
+        ex)
+        make_path_table({'training': {'batchsize': 64}}) =
+        def _check_0(value):
+            return type(value) is Training
+        ...
+        _PATH_TABLE = {
+            '/training': ('Training', _check_0, operator.attrgetter('training'), dataclasses.MISSING),
+            '/training/batchsize': ('int', _check_1, operator.attrgetter('training.batchsize'), 64),
+        }
+        """
         indent = "    "
-        members = f'\n{indent}'.join(members)
-        if len(self.post_inits) > 0:
-            post_inits = f'\n{indent}{indent}'.join([f'{pi}' for pi in self.post_inits])
-            class_def = f"@dataclasses.dataclass(frozen=True)\n" \
-                        f"class {class_name}:\n" \
-                        f"{indent}{members}\n\n" \
-                        f"{indent}def __post_init__(self):\n" \
-                        f"{indent}{indent}{post_inits}"
-        else:
-            class_def = f"@dataclasses.dataclass(frozen=True)\n" \
-                        f"class {class_name}:\n" \
-                        f"{indent}{members}"
-        # 既に登録済みのclassはスルーする
-        if class_name in self.dataclasses and len(self.dataclasses[class_name]) > len(class_def):
-            return
-        self.dataclasses[class_name] = class_def
+        checks = OrderedDict()
+        entries = []
+        stack = [('', '', setting)]
+        while stack:
+            parent_key, child_class_prefix, values = stack.pop()
+            for k, v in values.items():
+                key = f'{parent_key}/{k}'
+                key_type_name, default_value = self.get_type_and_default(v, self.to_class_name(k), child_class_prefix)
+                if isinstance(v, dict):
+                    expression = f'type(value) is {key_type_name}'
+                    default_value = 'dataclasses.MISSING'
+                    stack.append((key, key_type_name, v))
+                else:
+                    expression = self.check_expression(v, 'value')
+                check_name = checks.setdefault(expression, f'_check_{len(checks)}')
+                getter = f"operator.attrgetter('{key[1:].replace('/', '.')}')"
+                entries.append(f"{indent}'{key}': ('{key_type_name}', {check_name}, {getter}, {default_value}),")
+        functions = [f'def {check_name}(value):\n{indent}return {expression}\n\n'
+                     for expression, check_name in checks.items()]
+        return '\n'.join(functions) + '\n_PATH_TABLE = {\n' + '\n'.join(entries) + '\n}'
+
+    @classmethod
+    def check_expression(cls, value: Any, variable: str, in_tuple: bool = False, negate: bool = False) -> str:
+        """
+        variableがvalueと同じ型かどうかを判定する式を返す (negate=Trueなら異なるかどうか)
+        tupleの要素はisinstanceで、それ以外は型の完全一致で判定する
+        ex) check_expression([1, 2.], 'v') = '(type(v) is tuple and len(v) == 2 and isinstance(v[0], int) and ...)'
+        """
+        element_type = cls.variadic_type(value)
+        if element_type is not None:
+            # 要素の型の集合をCで作り、要素数によらず1つの式で判定する. tupleの要素と同じくboolはintとして扱う
+            element_types = '{int, bool}' if element_type is int else f'{{{element_type.__name__}}}'
+            expression = f'(type({variable}) is tuple and set(map(type, {variable})) <= {element_types})'
+            return f'not {expression}' if negate else expression
+        if isinstance(value, list) or isinstance(value, tuple):
+            conditions = [f'type({variable}) is tuple', f'len({variable}) == {len(value)}']
+            conditions.extend([cls.check_expression(v, f'{variable}[{i}]', in_tuple=True) for i, v in enumerate(value)])
+            expression = f'({" and ".join(conditions)})'
+            return f'not {expression}' if negate else expression
+        is_ = 'is not' if negate else 'is'
+        if value is None:
+            return f'{variable} {is_} None'
+        if type(value) not in (int, float, str, bool):
+            return 'False' if negate else 'True'
+        if in_tuple:
+            return f'not isinstance({variable}, {type(value).__name__})' if negate \
+                else f'isinstance({variable}, {type(value).__name__})'
+        return f'type({variable}) {is_} {type(value).__name__}'
+
+    @classmethod
+    def variadic_type(cls, value: Any) -> Optional[type]:
+        """
+        valueが variadic_threshold 以上の長さで、全ての要素が同じ型 (int, float, str, bool) のlistならその型を返す
+        """
+        if not (isinstance(value, list) or isinstance(value, tuple)) or len(value) < cls.variadic_threshold:
+            return None
+        element_types = set(map(type, value))
+        if len(element_types) != 1:
+            return None
+        element_type = element_types.pop()
+        return element_type if element_type in (int, float, str, bool) else None
+
+    @property
+    def dataclass_decorator(self) -> str:
+        if self.slots:
+            return '@dataclasses.dataclass(frozen=True, slots=True)'
+        return '@dataclasses.dataclass(frozen=True)'
 
     @staticmethod
     def to_class_name(key: str):
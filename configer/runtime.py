@@ -0,0 +1,11 @@
+"""
+生成されたConfigモジュールが共有するランタイム
+`configer create --runtime shared` で生成したモジュールは core.py などを埋め込まずにここからimportする
+"""
+from .template.type_hint import TypePathLike
+from .template.errors import ConfigerError, ConflictError, ChangeDefaultError, InvalidTypeError
+from .template.utils import hash_md5, hash_file, FingerprintCache, fingerprint_cache, ParsedFileCache
+from .template.utils import load_setting_file
+from .template.core import ConfigBase, ConfigDiff, ConfigGeneratorBase, ConfigHandle, GenerateCache
+from .template.core import _check_unknown_keys, _build_child, _invalid_type_error, _intern_value, _KeyTrie
+from .template.core import _materialize, _is_materialized
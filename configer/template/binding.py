@@ -0,0 +1,49 @@
+# no include
+import typing
+import dataclasses
+
+from .type_hint import TypePathLike
+from .core import ConfigBase, ConfigGeneratorBase
+
+
+@dataclasses.dataclass(frozen=True)
+class _Config:
+    pass
+
+
+def get_default_file_and_hash() -> typing.Tuple[str, str]:
+    pass
+
+
+def get_default_hash_algorithm() -> str:
+    pass
+
+
+def _validate__Config(obj: _Config, path: str, origins: typing.Dict[str, TypePathLike]):
+    pass
+
+
+_PATH_TABLE: typing.Dict[str, typing.Tuple[str, typing.Callable[[typing.Any], bool],
+                                           typing.Callable[[typing.Any], typing.Any], typing.Any]] = {}
+
+
+# no include
+@dataclasses.dataclass(frozen=True)
+class Config(_Config, ConfigBase):
+    _origins: typing.ClassVar[typing.Dict[str, TypePathLike]]
+    _default_file_and_hash = staticmethod(get_default_file_and_hash)
+    _path_table = _PATH_TABLE
+    # dataclassが生成する全fieldを比較する __eq__ / __hash__ の代わりにキャッシュしたfingerprintを使う
+    __eq__ = ConfigBase._fingerprint_eq
+    __hash__ = ConfigBase._fingerprint_hash
+
+
+class ConfigGenerator(ConfigGeneratorBase):
+    _config_class = Config
+    _default_file_and_hash = staticmethod(get_default_file_and_hash)
+    _default_hash_algorithm = staticmethod(get_default_hash_algorithm)
+    _validate = staticmethod(_validate__Config)
+    _path_table = _PATH_TABLE
+
+    def generate(self) -> Config:
+        return super().generate()
@@ -1,55 +1,121 @@
 # no include
+import os
+import sys
+import time
 import typing
 import pathlib
-import toml
-import yaml
 import dataclasses
-import random
 
 from .type_hint import TypePathLike
 from .errors import InvalidTypeError, ChangeDefaultError, ConflictError
-from .utils import hash_md5
-from clint import textui
-import functools
+from .utils import fingerprint_cache, load_setting_file, ParsedFileCache
 
 
-@dataclasses.dataclass(frozen=True)
-class _Config:
-    pass
+# no include
+class ConfigDiff(typing.NamedTuple):
+    path: str
+    value: typing.Any
+    other_value: typing.Any
+    origin: typing.Optional[TypePathLike]
+    other_origin: typing.Optional[TypePathLike]
+
+
+class ConfigBase:
+    """
+    生成されたConfigの共通メソッド
+    生成されたモジュールの Config が _default_file_and_hash, _path_table を設定する
+    """
+    _origins: typing.Dict[str, TypePathLike]
+    _default_file_and_hash: typing.Callable[[], typing.Tuple[str, str]]
+    _path_table: typing.Dict[str, typing.Tuple[str, typing.Callable[[typing.Any], bool],
+                                               typing.Callable[[typing.Any], typing.Any], typing.Any]]
 
+    def diff(self, other: 'ConfigBase') -> typing.List['ConfigDiff']:
+        """
+        otherとの差分を返す. 中間のdictは作らず、同一オブジェクトの部分木は辿らない
+        :param other: 比較対象のConfig
+        :return: 値が異なるkeyごとの (path, 自分の値, otherの値, 自分の設定元, otherの設定元)
+        """
+        origins = getattr(self, '_origins', None) or {}
+        other_origins = getattr(other, '_origins', None) or {}
+        return [ConfigDiff(path, value, other_value, origins.get(path), other_origins.get(path))
+                for path, value, other_value in _iter_diff(self, other)]
 
-def get_default_file_and_hash() -> typing.Tuple[str, str]:
-    pass
+    def fingerprint(self) -> str:
+        """
+        値だけから決まるdigestを返す. プロセスやマシンが変わっても同じ値になり、インスタンスごとに一度だけ計算する
+        :return:
+        """
+        fingerprint = self.__dict__.get('_fingerprint')
+        if fingerprint is None:
+            import hashlib
 
+            # reprはfloatも含めて決定的で、1 / 1.0 / True も区別できる
+            canonical = '\n'.join([f'{path}={value!r}' for path, value in _iter_leaves(self)])
+            fingerprint = hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+            object.__setattr__(self, '_fingerprint', fingerprint)
+        return fingerprint
 
-# no include
-@dataclasses.dataclass(frozen=True)
-class Config(_Config):
-    _origins: typing.ClassVar[typing.Dict[str, TypePathLike]]
+    def _fingerprint_eq(self, other: typing.Any) -> bool:
+        if other is self:
+            return True
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.fingerprint() == other.fingerprint()
+
+    def _fingerprint_hash(self) -> int:
+        return int(self.fingerprint()[:16], 16)
+
+    def get(self, path: str) -> typing.Any:
+        """
+        pathで指定したキーの値を返す. 部分木のpathならそのdataclassを返す
+        :param path: '/models/base_mlp/in_channels' または 'models.base_mlp.in_channels'
+        :return:
+        """
+        return self._path_entry(path)[2](self)
+
+    def origin(self, path: str) -> typing.Optional[TypePathLike]:
+        """
+        pathで指定したキーを上書きした設定元を返す. default値のままならNone
+        :param path: '/models/base_mlp/in_channels' または 'models.base_mlp.in_channels'
+        :return:
+        """
+        self._path_entry(path)
+        return (getattr(self, '_origins', None) or {}).get(_to_path(path))
+
+    def _path_entry(self, path: str) -> typing.Tuple[str, typing.Callable[[typing.Any], bool],
+                                                     typing.Callable[[typing.Any], typing.Any], typing.Any]:
+        try:
+            return self._path_table[_to_path(path)]
+        except KeyError:
+            raise AttributeError(f'キー {path} は定義されていません') from None
 
     def pprint(self, wait: bool):
-        default_config = dataclasses.asdict(_Config())
+        import random
+        from clint import textui
 
         """print setting values"""
+        changed = {d.path: d for d in self.diff(type(self)())}
 
-        def print_dict(d1: dict, d2: dict, depth: int = 0, parent_key: str = ''):
-            for k1, v1 in d1.items():
-                indent = ' ' * depth
-                if isinstance(v1, dict):
-                    textui.puts(f"{indent}{textui.colored.blue(k1)}")
-                    print_dict(v1, d2[k1], depth + 1, parent_key=f'{parent_key}/{k1}')
+        def print_config(config: typing.Any, depth: int = 0, parent_key: str = ''):
+            indent = ' ' * depth
+            for k in _dataclass_field_names(config):
+                v = getattr(config, k)
+                key = f'{parent_key}/{k}'
+                if _dataclass_field_names(v) is not None:
+                    textui.puts(f"{indent}{textui.colored.blue(k)}")
+                    print_config(v, depth + 1, parent_key=key)
+                elif key not in changed:
+                    # same as default
+                    textui.puts(f"{indent}{textui.colored.blue(k)}: {textui.colored.green(str(v))}")
                 else:
-                    if d1[k1] == d2[k1]:
-                        # same as default
-                        textui.puts(f"{indent}{textui.colored.blue(k1)}: {textui.colored.green(str(v1))}")
-                    else:
-                        origin_k = f'{parent_key}/{k1}'
-                        textui.puts(f"{indent}{textui.colored.yellow(k1)}: {textui.colored.red(str(v1))}"
-                                    f" (default: {textui.colored.green(str(d2[k1]))}, "
-                                    f"changed by {self._origins[origin_k]})")
+                    textui.puts(f"{indent}{textui.colored.yellow(k)}: {textui.colored.red(str(v))}"
+                                f" (default: {textui.colored.green(str(changed[key].other_value))}, "
+                                f"changed by {changed[key].origin})")
 
-        textui.puts(f"default from {textui.colored.green(str(pathlib.Path.cwd() / get_default_file_and_hash()[0]))}")
-        print_dict(dataclasses.asdict(self), default_config, 0, '')
+        default_file = pathlib.Path.cwd() / self._default_file_and_hash()[0]
+        textui.puts(f"default from {textui.colored.green(str(default_file))}")
+        print_config(self, 0, '')
 
         if wait:
             random_code = ''.join(random.choices([str(i) for i in range(10)], k=3))
@@ -61,107 +127,255 @@ class Config(_Config):
                 print("OK, now re-check your settings.")
                 exit()
 
+    def publish(self, name: typing.Optional[str] = None) -> typing.Any:
+        """
+        save_as(..., 'binary') と同じ形式で共有メモリに書き込む. 子プロセスは ConfigGenerator().attach(shm.name) で読み込む
+        返り値の multiprocessing.shared_memory.SharedMemory はpublishしたプロセスが所有し、
+        attachしたプロセスが全て読み終えてから close / unlink する
+        :param name: 共有メモリの名前. Noneなら自動で決める
+        :return:
+        """
+        from multiprocessing import shared_memory
+
+        data = _dump_snapshot(self)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+        shm.buf[:len(data)] = data
+        _published_names.add(shm.name)
+        return shm
+
     def save_as(self, out_path: TypePathLike, data_type: str):
+        """
+        :param out_path:
+        :param data_type: 'yml', 'yaml', 'toml' または 'binary' (ConfigGenerator.load_snapshot で読み込める形式)
+        """
         out_path = pathlib.Path(out_path)
         out_dir: pathlib.Path = out_path.parent
         if not out_dir.is_dir():
             out_dir.mkdir(exist_ok=False)
+        if data_type == 'binary':
+            with out_path.open('wb') as f:
+                f.write(_dump_snapshot(self))
+            return
         with out_path.open('w') as f:
             current_dict = dataclasses.asdict(self)
             if data_type == 'yml' or data_type == 'yaml':
+                import yaml
                 yaml.safe_dump(current_dict, f)
             elif data_type == 'toml':
+                import toml
                 toml.dump(current_dict, f)
             else:
                 raise RuntimeError('Not supported type.')
 
 
-class ConfigGenerator:
+class ConfigGeneratorBase:
+    """
+    生成されたConfigGeneratorの共通処理
+    生成されたモジュールの ConfigGenerator が以下のクラス属性を設定する
+    _config_class: 生成するConfigのクラス
+    _default_file_and_hash, _default_hash_algorithm: 生成時のdefault fileとそのhash
+    _validate: 全fieldを検査する関数 (_validate__Config)
+    _path_table: キーのpathから (型名, 検査する関数, 値を取り出す関数, default値) への表 (_PATH_TABLE)
+    """
+    _config_class: typing.Type[ConfigBase]
+    _default_file_and_hash: typing.Callable[[], typing.Tuple[str, str]]
+    _default_hash_algorithm: typing.Callable[[], str]
+    _validate: typing.Callable[[ConfigBase, str, typing.Dict[str, TypePathLike]], None]
+    _path_table: typing.Dict[str, typing.Tuple[str, typing.Callable[[typing.Any], bool],
+                                               typing.Callable[[typing.Any], typing.Any], typing.Any]]
+
     def __init__(self,
                  assert_identical_to_default: bool = True,
-                 identical_to: typing.Optional[TypePathLike] = None
+                 identical_to: typing.Optional[TypePathLike] = None,
+                 strict_hash: bool = False,
+                 cache_dir: typing.Optional[TypePathLike] = None,
+                 validate_overrides_only: bool = False,
+                 intern_values: bool = False,
+                 cache: typing.Optional['GenerateCache'] = None
                  ):
+        """
+        :param assert_identical_to_default: default fileが生成時から変更されていないか確認する
+        :param identical_to: 比較対象のdefault file
+        :param strict_hash: Trueならstatによるキャッシュを使わず毎回default file全体をhashする
+        :param cache_dir: パース済みの上書きファイルを保存するディレクトリ. Noneなら環境変数 CONFIGER_CACHE_DIR を使う
+        :param validate_overrides_only: Trueなら上書きされたキーだけを検査する (default値は生成時に検査済み)
+        :param intern_values: Trueなら上書きされた文字列とtupleをinternし、多数のConfig間で同じオブジェクトを共有する.
+                              tupleはプロセス全体で最近使った _interned_tuples.maxsize (4096) 個までを共有する
+        :param cache: 指定した場合はdefault fileと上書きの内容が同じなら以前にgenerateしたConfigを返す.
+                      上書きファイルの読み込みはgenerateでキャッシュに無かったときまで遅延する
+        """
         self._origins: typing.Dict[str, TypePathLike] = {}
         self._update_params: typing.Dict[str, typing.Any] = {}
-        self._config: typing.Optional[Config] = None
+        self._config: typing.Optional[ConfigBase] = None
+        # update_by に渡されたファイル (呼び出しごと). watch で再読み込みする際に使う
+        self._sources: typing.List[typing.List[typing.Union[pathlib.Path, _InlineOverride]]] = []
         self.assert_identical = assert_identical_to_default or identical_to is not None
+        self.strict_hash = strict_hash
+        self.validate_overrides_only = validate_overrides_only
+        self.intern_values = intern_values
+        self.cache = cache
+        # cacheを使う場合に generate まで遅延している上書き (update_by のファイルのリスト または update_with の上書き)
+        self._deferred: typing.List[typing.Union[typing.Tuple[typing.List[pathlib.Path], typing.Optional[int], bool],
+                                                 _InlineOverride]] = []
+        self.parsed_file_cache = ParsedFileCache(cache_dir) if cache_dir is not None else ParsedFileCache.from_env()
         self.default_file = identical_to
         if identical_to is None:
-            d_path = get_default_file_and_hash()[0]
+            d_path = self._default_file_and_hash()[0]
             if d_path[0] == '/':
                 self.default_file = pathlib.Path(d_path)
             else:
                 self.default_file = pathlib.Path.cwd() / d_path
 
-    def __load(self, file: pathlib.Path):
-        assert isinstance(file, pathlib.Path), f'file expected: pathlib.Path, actual {type(file)}'
-        assert file.is_file(), f'{file} is not a valid file path'
-        # Load Setting
-        if file.suffix == '.toml':
-            with file.open('r') as f:
-                params = toml.load(f)
-        elif file.suffix == '.yaml' or file.suffix == '.yml':
-            with file.open('r') as f:
-                params = yaml.safe_load(f)
-        else:
-            raise RuntimeError('Not support type (Toml / Yaml)')
-
-        def list_to_tuple(d: typing.MutableMapping[str, typing.Any]):
-            for k, v in d.items():
-                if isinstance(v, list):
-                    d[k] = tuple(v)
-                if isinstance(v, dict):
-                    list_to_tuple(v)
+    def __load_all(self, files: typing.List[pathlib.Path], max_workers: typing.Optional[int], use_processes: bool) \
+            -> typing.List[typing.Tuple[typing.Dict[str, typing.Any], typing.List[str]]]:
+        if max_workers is None or len(files) < 2:
+            return [_load_override_file(file, self.parsed_file_cache) for file in files]
+        import concurrent.futures
 
-        list_to_tuple(params)
+        if use_processes:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        with executor:
+            return list(executor.map(_load_override_file, files, [self.parsed_file_cache] * len(files)))
 
-        p_keys = set(_get_keys(params))
+    def __apply(self, files: typing.List[pathlib.Path],
+                loaded: typing.List[typing.Tuple[typing.Dict[str, typing.Any], typing.List[str]]]):
+        # 読み込みは並列でもoriginは呼び出し順に記録し、直列に読み込んだ場合と同じ結果にする
+        for file, (_, p_keys) in zip(files, loaded):
+            for p_key in p_keys:
+                self._origins[p_key] = file
+        if len(files) > 1:
+            merged = self._safe_file_merge([(file, params) for file, (params, _) in zip(files, loaded)])
+            _update_nested_dict(self._update_params, merged)
+        else:
+            _update_nested_dict(self._update_params, loaded[0][0])
+        self._sources.append(files)
 
-        for p_key in p_keys:
-            self._origins[p_key] = file
+    def _check_type(self):
+        if self._config is None:
+            raise RuntimeError('generateが呼ばれていません')
+        # configer create 時に生成した検査関数で全fieldを確認する
+        self._validate(self._config, '', self._origins)
 
-        return params
+    def _check_overrides(self):
+        for key, value in _get_items(self._update_params):
+            if key not in self._path_table:
+                raise AttributeError(f'キー {key} が{self.default_file}で定義されていません')
+            type_name, check, _, _ = self._path_table[key]
+            if not check(value):
+                raise _invalid_type_error(key, type_name, value, self._origins)
 
-    def _check_type(self):
+    def generate(self) -> ConfigBase:
+        if self.cache is None:
+            return self._generate()
+        # キャッシュにあっても、default fileの変更はキャッシュを使わない場合と同じく検出する
+        self._check_default_file()
+        key = self._cache_key()
+        config = self.cache.get(key) if key is not None else None
+        if config is None:
+            self._apply_deferred()
+            config = self._build()
+            if key is not None:
+                self.cache.put(key, config)
+        self._config = config
+        return config
 
-        def _check_type(obj):
-            for field in dataclasses.fields(obj):
-                child_obj = obj.__getattribute__(field.name)
+    def _cache_key(self) -> typing.Optional[typing.Tuple[typing.Any, ...]]:
+        """(生成したクラス, default fileのhash, 上書きごとのhash) . default fileが無い場合はNone"""
+        if not self.default_file.is_file():
+            return None
+        default_hash = fingerprint_cache.digest(
+            self.default_file, self._default_hash_algorithm(), strict=self.strict_hash)
+        overrides = []
+        for group in self._sources + self._deferred:
+            if isinstance(group, _InlineOverride):
+                group = [group]
+            elif isinstance(group, tuple):
+                group = group[0]
+            overrides.append(tuple(source.digest() if isinstance(source, _InlineOverride)
+                                   else (str(source), fingerprint_cache.digest(source, 'blake2b'))
+                                   for source in group))
+        return self._config_class, default_hash, tuple(overrides)
 
-                if type(child_obj) == tuple:
-                    actual_type = [str(type(c)) for c in child_obj]
-                    if len(field.type.__args__) == 1 \
-                            or (len(field.type.__args__) == 2 and field.type.__args__[-1] == Ellipsis):
-                        if not all([isinstance(c, field.type.__args__[0]) for c in child_obj]):
-                            raise InvalidTypeError(field.name, str(field.type), f"Tuple[{actual_type}]")
-                    else:
-                        if len(field.type.__args__) != len(child_obj):
-                            raise InvalidTypeError(field.name, str(field.type), f"Tuple[{actual_type}]")
-                        if not all([isinstance(c, t) for c, t in zip(child_obj, field.type.__args__)]):
-                            raise InvalidTypeError(field.name, str(field.type), f"Tuple[{actual_type}]")
-                    continue
-                if dataclasses.is_dataclass(child_obj):
-                    _check_type(child_obj)
-                if child_obj is None and (field.type is None):
-                    continue
-                if type(child_obj) != field.type:
-                    raise InvalidTypeError(field.name, str(field.type), str(type(child_obj)))
-        if self._config is None:
-            raise RuntimeError('generateが呼ばれていません')
+    def _apply_deferred(self):
+        deferred, self._deferred = self._deferred, []
+        for entry in deferred:
+            if isinstance(entry, _InlineOverride):
+                self.__apply_inline(entry)
+            else:
+                file_path_list, max_workers, use_processes = entry
+                self.__apply(file_path_list, self.__load_all(file_path_list, max_workers, use_processes))
 
-        _check_type(self._config)
+    def _generate(self) -> ConfigBase:
+        self._check_default_file()
+        return self._build()
 
-    def generate(self) -> Config:
-        self._config = Config()
+    def _check_default_file(self):
         if self.assert_identical:
             if not self.default_file.is_file():
                 raise FileNotFoundError(f'{self.default_file} is not a valid file')
-            current_hash = hash_md5(self.default_file)
-            previous_hash = get_default_file_and_hash()[1]
+            current_hash = fingerprint_cache.digest(
+                self.default_file, self._default_hash_algorithm(), strict=self.strict_hash)
+            previous_hash = self._default_file_and_hash()[1]
             if current_hash != previous_hash:
                 raise ChangeDefaultError(self.default_file)
+
+    def _build(self) -> ConfigBase:
+        if self.intern_values:
+            _intern_value(self._update_params)
+        if self.validate_overrides_only:
+            self._check_overrides()
+            self._set_params()
+        else:
+            self._set_params()
+            self._check_type()
+        return self._config
+
+    def load_snapshot(self, snapshot_path: TypePathLike) -> ConfigBase:
+        """
+        save_as(..., 'binary') で保存したConfigを読み込む
+        保存時とdefault fileのhashが一致する場合は検査済みの値としてそのままConfigを作り、
+        一致しない場合は保存された値を上書きとして generate と同じ検査を行う
+        :param snapshot_path:
+        :return:
+        """
+        return self._restore(*_load_snapshot(pathlib.Path(snapshot_path)))
+
+    def attach(self, name: str) -> ConfigBase:
+        """
+        Config.publish で共有メモリに置いたConfigを読み込む. 再パースも (hashが一致すれば) 再検査も行わない
+        :param name: publishが返したSharedMemoryのname
+        :return:
+        """
+        import multiprocessing
+        from multiprocessing import shared_memory
+
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            shm = shared_memory.SharedMemory(name=name)
+            # 3.12以前は開いただけでresource trackerに登録され、multiprocessingで起動されていないプロセスでは
+            # 終了時に共有メモリがunlinkされてしまう. 所有者はpublishしたプロセスなので登録を取り消す.
+            # multiprocessingの子プロセスは親とresource trackerを共有するので取り消すと親の登録が消える
+            if os.name == 'posix' and name not in _published_names and multiprocessing.parent_process() is None:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, 'shared_memory')
+        try:
+            snapshot = _parse_snapshot(shm.buf, name)
+        finally:
+            shm.close()
+        return self._restore(*snapshot)
+
+    def _restore(self, default_hash: str, params: typing.Dict[str, typing.Any],
+                 origins: typing.Dict[str, TypePathLike]) -> ConfigBase:
+        self._update_params = params
+        self._origins = origins
+        if default_hash != self._default_file_and_hash()[1]:
+            return self._generate()
+        if self.intern_values:
+            _intern_value(self._update_params)
         self._set_params()
-        self._check_type()
         return self._config
 
     def update_by(
@@ -169,60 +383,852 @@ class ConfigGenerator:
             file_paths: typing.Union[
                 TypePathLike,
                 typing.List[TypePathLike],
-                typing.Tuple[TypePathLike]]
+                typing.Tuple[TypePathLike]],
+            max_workers: typing.Optional[int] = None,
+            use_processes: bool = False
+    ):
+        """
+        :param file_paths: 上書きする設定ファイル. 複数の場合はファイル間で同じキーを設定すると ConflictError
+        :param max_workers: 指定した場合はファイルの読み込みとパースを並列に行う
+        :param use_processes: Trueならスレッドではなくプロセスでパースする
+        :return:
+        """
+        file_path_list = _to_path_list(file_paths)
+        if len(file_path_list) == 0:
+            return
+        if self.cache is not None:
+            self._deferred.append((file_path_list, max_workers, use_processes))
+            return self
+        self.__apply(file_path_list, self.__load_all(file_path_list, max_workers, use_processes))
+        return self
+
+    async def aupdate_by(
+            self,
+            file_paths: typing.Union[
+                TypePathLike,
+                typing.List[TypePathLike],
+                typing.Tuple[TypePathLike]],
+            executor: typing.Optional[typing.Any] = None
     ):
-        if not isinstance(file_paths, list) and not isinstance(file_paths, tuple):
-            file_paths = [file_paths]
-        file_path_list: typing.List[pathlib.Path] = list(map(pathlib.Path, file_paths))
+        """
+        update_by のasyncio版. ファイルの読み込みとパースをexecutorで並行に行い、event loopを止めない
+        結果と送出する例外は update_by と同じ
+        :param file_paths:
+        :param executor: run_in_executor に渡すexecutor. Noneならevent loopのdefault executor
+        :return:
+        """
+        import asyncio
+
+        file_path_list = _to_path_list(file_paths)
         if len(file_path_list) == 0:
             return
-        elif len(file_path_list) > 1:
-            _update_nested_dict(self._update_params,
-                                functools.reduce(self._safe_file_merge, map(self.__load, file_path_list)))
+        loop = asyncio.get_running_loop()
+        loaded = await asyncio.gather(*[
+            loop.run_in_executor(executor, _load_override_file, file, self.parsed_file_cache)
+            for file in file_path_list])
+        self.__apply(file_path_list, list(loaded))
+        return self
+
+    async def agenerate(self, executor: typing.Optional[typing.Any] = None) -> ConfigBase:
+        """
+        generate のasyncio版. default fileのhash計算と検査をexecutorで行う
+        :param executor: run_in_executor に渡すexecutor. Noneならevent loopのdefault executor
+        :return:
+        """
+        import asyncio
+
+        return await asyncio.get_running_loop().run_in_executor(executor, self.generate)
+
+    def update_with(self, params: typing.Mapping[str, typing.Any], origin: str = 'dict'):
+        """
+        ファイルを介さずに辞書で上書きする. キーは入れ子の辞書でも'.'区切りでもよく、同じキーを2回設定すると ConflictError
+        ex) update_with({'models.base_mlp.in_channels': 5}, origin='cli')
+        :param params:
+        :param origin: _origins に記録する上書き元
+        :return:
+        """
+        key_trie = _KeyTrie()
+        conflicts = []
+        nested: typing.Dict[str, typing.Any] = {}
+        for key, value in _iter_dotted(params):
+            *parents, leaf = key[1:].split('/')
+            d = node = {}
+            for k in parents:
+                node = node.setdefault(k, {})
+            node[leaf] = value
+            conflicts.extend(key_trie.insert(d, origin))
+            _update_nested_dict(nested, d)
+        if len(conflicts) > 0:
+            raise ConflictError(*conflicts)
+        source = _InlineOverride(origin, nested, _get_keys(nested))
+        if self.cache is not None:
+            self._deferred.append(source)
         else:
-            d = self.__load(file_path_list[0])
-            _update_nested_dict(self._update_params, d)
-            for d_k in _get_keys(d):
-                self._origins[d_k] = file_path_list[0]
+            self.__apply_inline(source)
         return self
 
-    def _safe_file_merge(self, d1: typing.Dict[str, typing.Any], d2: typing.Dict[str, typing.Any]) \
-            -> typing.Dict[str, typing.Any]:
+    def __apply_inline(self, source: '_InlineOverride'):
+        for key in source.keys:
+            self._origins[key] = source.origin
+        _update_nested_dict(self._update_params, _copy_dicts(source.params))
+        self._sources.append([source])
+
+    def update_from_args(self, argv: typing.Optional[typing.Sequence[str]] = None, origin: str = 'cli'):
+        """
+        コマンドライン引数で上書きする. 値は生成時の型に変換し、同じキーを2回指定すると ConflictError
+        ex) ['--optimizer.adam.alpha=0.3', '--training.batchsize', '32', 'use_model=base_mlp']
+        :param argv: Noneなら sys.argv[1:]
+        :param origin: _origins に記録する上書き元
+        :return:
+        """
+        argv = list(sys.argv[1:] if argv is None else argv)
+        params = {}
+        conflicts = []
+        i = 0
+        while i < len(argv):
+            arg = argv[i]
+            if '=' in arg:
+                key, text = arg.split('=', 1)
+            elif i + 1 < len(argv):
+                key, text = arg, argv[i + 1]
+                i += 1
+            else:
+                raise RuntimeError(f'{arg} に値が指定されていません')
+            key = key.lstrip('-')
+            path = '/' + key.replace('.', '/')
+            if key in params:
+                conflicts.append(((path, origin), (path, origin)))
+            params[key] = self._coerce(path, text, origin)
+            i += 1
+        if len(conflicts) > 0:
+            raise ConflictError(*conflicts)
+        return self.update_with(params, origin)
+
+    def update_from_env(self, prefix: str = 'CONFIGER__', environ: typing.Optional[typing.Mapping[str, str]] = None,
+                        origin: str = 'env'):
+        """
+        環境変数で上書きする. prefix以降を '__' で区切ったものをキーとし、大文字小文字は区別しない
+        大文字小文字だけが異なる変数で同じキーを2回設定すると ConflictError
+        ex) CONFIGER__OPTIMIZER__ADAM__ALPHA=0.3
+        :param prefix:
+        :param environ: Noneなら os.environ
+        :param origin: _origins に記録する上書き元
+        :return:
+        """
+        environ = os.environ if environ is None else environ
+        paths = {path.lower(): path for path in self._path_table}
+        params = {}
+        conflicts = []
+        for name, text in environ.items():
+            if not name.startswith(prefix):
+                continue
+            key = '/' + name[len(prefix):].replace('__', '/').lower()
+            if key not in paths:
+                raise AttributeError(f'キー {key} が{self.default_file}で定義されていません')
+            dotted_key = paths[key][1:].replace('/', '.')
+            # 大文字小文字だけが異なる変数は同じキーになる
+            if dotted_key in params:
+                conflicts.append(((paths[key], origin), (paths[key], origin)))
+            params[dotted_key] = self._coerce(paths[key], text, origin)
+        if len(conflicts) > 0:
+            raise ConflictError(*conflicts)
+        return self.update_with(params, origin)
+
+    def _coerce(self, key: str, text: str, origin: str) -> typing.Any:
+        """文字列の値をキーの型に変換する"""
+        if key not in self._path_table:
+            raise AttributeError(f'キー {key} が{self.default_file}で定義されていません')
+        type_name, _, _, _ = self._path_table[key]
+        try:
+            if type_name == 'str':
+                return text
+            if type_name == 'int':
+                return int(text)
+            if type_name == 'float':
+                return float(text)
+            if type_name == 'bool' and text.lower() in _BOOL_STRINGS:
+                return _BOOL_STRINGS[text.lower()]
+            if type_name == 'None' and text.lower() in ('', 'none', 'null', '~'):
+                return None
+            if type_name.startswith('typing.Tuple['):
+                import yaml
+                value = yaml.safe_load(text)
+                return _list_to_tuple(value) if isinstance(value, list) else value
+        except (ValueError, ImportError):
+            pass
+        raise _invalid_type_error(key, type_name, text, {key: origin})
 
-        d1_keys = set(_get_keys(d1))
-        d2_keys = set(_get_keys(d2))
+    def sweep(self, axes: typing.Mapping[str, typing.Sequence[typing.Any]],
+              base: typing.Optional[ConfigBase] = None) -> typing.Iterator[ConfigBase]:
+        """
+        baseの一部のキーを書き換えたConfigを全ての組み合わせについて順に返す
+        各値の検査は軸ごとに一度だけ行い、書き換えていない部分木はbaseのインスタンスを共有する
+        ex) sweep({'optimizer.adam.alpha': [0.1, 0.2], 'training.batchsize': [32, 64]}) は4つのConfigを返す
+        :param axes: '.'区切りのキーから候補の値のリストへの辞書
+        :param base: 書き換える元のConfig. Noneなら generate() の結果を使う
+        :return:
+        """
+        import itertools
 
-        for d1_key in d1_keys:
-            for d2_key in d2_keys:
-                if d1_key.startswith(d2_key) or d2_key.startswith(d1_key):
-                    raise ConflictError(((d1_key, self._origins[d1_key]), (d2_key, self._origins[d2_key])))
+        if base is None:
+            base = self._config if self._config is not None else self.generate()
+        paths = ['/' + key.replace('.', '/') for key in axes]
+        for i, path in enumerate(paths):
+            if path not in self._path_table:
+                raise AttributeError(f'キー {path} が{self.default_file}で定義されていません')
+            for other in paths[:i]:
+                if other.startswith(path + '/') or path.startswith(other + '/'):
+                    raise RuntimeError(f'{other} と {path} は同じ部分木を書き換えています')
+        origins = getattr(base, '_origins', None) or {}
+        sweep_origins = {path: 'sweep' for path in paths}
+        candidates = []
+        for path, values in zip(paths, axes.values()):
+            values = [tuple(v) if isinstance(v, list) else v for v in values]
+            type_name, check, _, _ = self._path_table[path]
+            for value in values:
+                if not check(value):
+                    raise _invalid_type_error(path, type_name, value, sweep_origins)
+            candidates.append(values)
+        for combination in itertools.product(*candidates):
+            overrides: typing.Dict[str, typing.Any] = {}
+            for path, value in zip(paths, combination):
+                *parents, leaf = path[1:].split('/')
+                node = overrides
+                for k in parents:
+                    node = node.setdefault(k, {})
+                node[leaf] = _SweepValue(value)
+            config = _replace_fields(base, overrides)
+            object.__setattr__(config, '_origins', {**origins, **sweep_origins})
+            yield config
 
-        _update_nested_dict(d1, d2)
-        return d1
+    def watch(self, interval: float = 1.0) -> 'ConfigHandle':
+        """
+        update_by に渡したファイルを監視し、変更があれば新しいConfigに差し替えるhandleを返す
+        handle.start() (または with文) でバックグラウンドのポーリングを開始する
+        :param interval: ポーリング間隔 (秒)
+        :return:
+        """
+        self._apply_deferred()
+        return ConfigHandle(self, interval)
+
+    @staticmethod
+    def _safe_file_merge(loaded_files: typing.List[typing.Tuple[TypePathLike, typing.Dict[str, typing.Any]]]) \
+            -> typing.Dict[str, typing.Any]:
+        """
+        ファイルごとのキーをprefix treeに登録しながらマージし、ファイル間の衝突をまとめて報告する
+        :param loaded_files: (origin, 読み込んだ辞書) のリスト
+        :return: マージ後の辞書
+        """
+        key_trie = _KeyTrie()
+        conflicts = []
+        merged: typing.Dict[str, typing.Any] = {}
+        for origin, d in loaded_files:
+            conflicts.extend(key_trie.insert(d, origin))
+            if len(conflicts) == 0:
+                _update_nested_dict(merged, d)
+        if len(conflicts) > 0:
+            raise ConflictError(*conflicts)
+        return merged
 
     def _set_params(self):
-        def __set(obj, d: typing.Dict[str, typing.Any]):
-            for k, v in d.items():
-                if not isinstance(v, dict):
-                    object.__setattr__(obj, k, v)
+        # 上書きする値とdefault値から各インスタンスを一度だけ作る
+        try:
+            self._config = self._config_class._from_dict(self._update_params)
+        except KeyError as e:
+            raise AttributeError(f'キー {e.args[0]} が{self.default_file}で定義されていません')
+        # 生成後にこのgeneratorが上書きを追加しても、生成済み (キャッシュ済み) のConfigのoriginは変えない
+        object.__setattr__(self._config, '_origins', dict(self._origins))
+
+
+class GenerateCache:
+    """
+    ConfigGenerator(cache=...) に渡し、同じ内容のgenerateで作ったConfigを使い回す
+    Configはimmutableなので同じインスタンスを共有してよい
+    """
+
+    def __init__(self, maxsize: typing.Optional[int] = 128, ttl: typing.Optional[float] = None):
+        """
+        :param maxsize: 保持するConfigの数. 超えた場合は最後に使われたのが古いものから捨てる. Noneなら無制限
+        :param ttl: 保持する秒数. Noneなら無期限
+        """
+        import threading
+        import collections
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: 'collections.OrderedDict[typing.Any, typing.Tuple[ConfigBase, float]]' = \
+            collections.OrderedDict()
+
+    def get(self, key: typing.Any) -> typing.Optional[ConfigBase]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[1] >= self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: typing.Any, config: ConfigBase):
+        with self._lock:
+            self._entries[key] = (config, time.monotonic())
+            self._entries.move_to_end(key)
+            while self.maxsize is not None and len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ConfigHandle:
+    """
+    ConfigGenerator.watch が返す. 上書きファイルのstatをポーリングし、変更されたファイルだけを再パースして
+    新しいConfigを作り、config の参照を差し替える. 読み出し側は常に検査済みの完全なConfigを得る
+    """
+
+    def __init__(self, generator: ConfigGeneratorBase, interval: float = 1.0):
+        import threading
+
+        self.interval = interval
+        self.last_error: typing.Optional[Exception] = None
+        self._generator = generator
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+        self._callbacks: typing.List[typing.Callable[[ConfigBase, ConfigBase], None]] = []
+        sources = list(dict.fromkeys(source for group in generator._sources for source in group))
+        files = [source for source in sources if not isinstance(source, _InlineOverride)]
+        # パースより先にstatを取り、パース中に書き換えられた場合も次のpollで検出する
+        self._fingerprints = {f: self._fingerprint(f) for f in files}
+        self._parsed = {f: _load_override_file(f, generator.parsed_file_cache) for f in files}
+        self._parsed.update({source: (source.params, source.keys)
+                             for source in sources if isinstance(source, _InlineOverride)})
+        self._config = generator.generate()
+
+    @property
+    def config(self) -> ConfigBase:
+        return self._config
+
+    def on_change(self, callback: typing.Callable[[ConfigBase, ConfigBase], None]):
+        """
+        :param callback: 差し替え後に (古いConfig, 新しいConfig) で呼ばれる
+        """
+        self._callbacks.append(callback)
+
+    @staticmethod
+    def _fingerprint(file: pathlib.Path) -> typing.Tuple[typing.Tuple[int, int, int], str]:
+        return fingerprint_cache.stat(file), fingerprint_cache.digest(file, 'blake2b')
+
+    def _changed_files(self) -> typing.Dict[pathlib.Path, typing.Tuple[typing.Tuple[int, int, int], str]]:
+        """
+        :return: 中身が変わったファイルとその新しいfingerprint. 反映に成功するまで self._fingerprints は更新しない
+        """
+        changed = {}
+        # 変更のないファイルはstat 1回で済ませる (数千ファイルを監視する場合もpollを安くする)
+        racy_since = time.time_ns() - fingerprint_cache.racy_window_ns
+        for file, (file_stat, digest) in self._fingerprints.items():
+            current_stat = fingerprint_cache.stat(file)
+            # mtimeが新しすぎるstatは同じtick内の書き換えを見逃すので中身も比較する
+            if current_stat == file_stat and current_stat[1] <= racy_since:
+                continue
+            current = self._fingerprint(file)
+            if current[1] != digest:
+                changed[file] = current
+            else:
+                self._fingerprints[file] = current
+        return changed
+
+    def poll(self) -> bool:
+        """
+        変更されたファイルを再読み込みし、変更されたキーだけを検査してConfigを差し替える
+        検査に失敗した場合は例外を送出し、それまでのConfigと読み込み状態を保持する.
+        失敗したファイルは次のpollでも変更されたファイルとして再検査される
+        :return: 差し替えたかどうか
+        """
+        with self._lock:
+            changed = self._changed_files()
+            if len(changed) == 0:
+                return False
+            generator = self._generator
+            parsed = dict(self._parsed)
+            for file in changed:
+                parsed[file] = _load_override_file(file, generator.parsed_file_cache)
+            params, origins = self._merge(parsed)
+            for file in changed:
+                for key, value in _get_items(parsed[file][0]):
+                    if origins.get(key) != file:
+                        continue
+                    if key not in generator._path_table:
+                        raise AttributeError(f'キー {key} が{generator.default_file}で定義されていません')
+                    type_name, check, _, _ = generator._path_table[key]
+                    if not check(value):
+                        raise _invalid_type_error(key, type_name, value, origins)
+            if generator.intern_values:
+                _intern_value(params)
+            previous = generator._update_params, generator._origins, generator._config
+            generator._update_params, generator._origins = params, origins
+            try:
+                generator._set_params()
+            except Exception:
+                generator._update_params, generator._origins, generator._config = previous
+                raise
+            self._parsed = parsed
+            self._fingerprints.update(changed)
+            old_config, self._config = self._config, generator._config
+        for callback in self._callbacks:
+            callback(old_config, self._config)
+        return True
+
+    def _merge(self, parsed: typing.Dict[typing.Any, typing.Tuple[typing.Dict[str, typing.Any], typing.List[str]]]) \
+            -> typing.Tuple[typing.Dict[str, typing.Any], typing.Dict[str, TypePathLike]]:
+        """パース済みの辞書からupdate_byと同じ順序で上書きする値とoriginを作り直す"""
+        params: typing.Dict[str, typing.Any] = {}
+        origins: typing.Dict[str, TypePathLike] = {}
+        for group in self._generator._sources:
+            # _update_nested_dict は辞書を共有するので、保持しているパース結果はコピーしてから渡す
+            loaded = [(_source_origin(source), _copy_dicts(parsed[source][0])) for source in group]
+            if len(loaded) > 1:
+                _update_nested_dict(params, ConfigGeneratorBase._safe_file_merge(loaded))
+            else:
+                _update_nested_dict(params, loaded[0][1])
+            for source in group:
+                for key in parsed[source][1]:
+                    origins[key] = _source_origin(source)
+        return params, origins
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+
+    def start(self) -> 'ConfigHandle':
+        import threading
+
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='configer-watch', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'ConfigHandle':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+class _KeyTrie:
+    """
+    キーのpathを要素ごとに保持するprefix tree
+    内部ノードはdict、葉は (key, origin) のtuple
+    """
+
+    def __init__(self):
+        self._root: typing.Dict[str, typing.Any] = {}
+
+    def insert(self, d: typing.Mapping[str, typing.Any], origin: TypePathLike) \
+            -> typing.List[typing.Tuple[typing.Tuple[str, TypePathLike], typing.Tuple[str, TypePathLike]]]:
+        """
+        dの全てのキーを登録し、既に登録されたキーとpathのprefixが一致するものを全て返す
+        ex) /optimizer/adam と /optimizer/adam/alpha は衝突するが、/lr と /lr_decay は衝突しない
+        """
+        conflicts = []
+        stack = [(d, self._root, '')]
+        while stack:
+            d_node, trie_node, parent_key = stack.pop()
+            for k, v in d_node.items():
+                key = f'{parent_key}/{k}'
+                registered = trie_node.get(k)
+                if isinstance(v, dict):
+                    if registered is None:
+                        registered = trie_node[k] = {}
+                    if isinstance(registered, dict):
+                        stack.append((v, registered, key))
+                    else:
+                        conflicts.extend((registered, (new_key, origin)) for new_key in _get_keys(v, key))
+                elif registered is None:
+                    trie_node[k] = (key, origin)
+                elif isinstance(registered, dict):
+                    conflicts.extend((leaf, (key, origin)) for leaf in self._leaves(registered))
                 else:
-                    try:
-                        __set(obj.__getattribute__(k), v)
-                    except AttributeError:
-                        raise AttributeError(f'キー {k} が{self.default_file}で定義されていません')
+                    conflicts.append((registered, (key, origin)))
+        return conflicts
 
-        __set(self._config, self._update_params)
-        object.__setattr__(self._config, '_origins', self._origins)
+    @staticmethod
+    def _leaves(trie_node: typing.Dict[str, typing.Any]) -> typing.Iterator[typing.Tuple[str, TypePathLike]]:
+        stack = [trie_node]
+        while stack:
+            for child in stack.pop().values():
+                if isinstance(child, dict):
+                    stack.append(child)
+                else:
+                    yield child
 
 
-def _get_keys(d: typing.MutableMapping[str, typing.Any], parent_key: str = ''):
-    keys: typing.List[str] = []
+def _check_unknown_keys(cls: type, d: typing.Mapping[str, typing.Any], path: str):
     for k in d:
-        if isinstance(d[k], dict):
-            keys.extend(_get_keys(d[k], parent_key=f'{parent_key}/{k}'))
+        if k not in cls._field_names:
+            raise KeyError(f'{path}/{k}')
+
+
+def _build_child(child_class: type, d: typing.Mapping[str, typing.Any], key: str, path: str) -> typing.Any:
+    """_from_dict から呼ばれ、上書きされていない部分木はdefault値で、辞書で上書きされた部分木は再帰的に作る"""
+    if key not in d:
+        return child_class()
+    value = d[key]
+    if type(value) is dict:
+        return child_class._from_dict(value, f'{path}/{key}')
+    # 辞書以外で上書きされた場合はそのまま設定し、型の検査でエラーにする
+    return value
+
+
+class _InternPool:
+    """
+    internしたtupleを保持するLRU. 長時間動くプロセスで上書きの値が変わり続けてもmaxsize個までしか保持しない
+    捨てたtupleを使っているConfigはそのまま残り、同じ値が次に来たときは新しいtupleを保持する
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        import threading
+        import collections
+
+        self.maxsize = maxsize
+        self._tuples: 'collections.OrderedDict[typing.Tuple[typing.Any, ...], tuple]' = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def intern(self, key: typing.Tuple[typing.Any, ...], value: tuple) -> tuple:
+        with self._lock:
+            interned = self._tuples.setdefault(key, value)
+            self._tuples.move_to_end(key)
+            while len(self._tuples) > self.maxsize:
+                self._tuples.popitem(last=False)
+            return interned
+
+    def clear(self):
+        with self._lock:
+            self._tuples.clear()
+
+    def __len__(self) -> int:
+        return len(self._tuples)
+
+
+_interned_tuples = _InternPool()
+
+
+def _intern_key(value: typing.Any) -> typing.Any:
+    # 1 と 1.0、1 と True、0.0 と -0.0 は等しいが別の値として扱う
+    if type(value) is tuple:
+        # 要素のtupleは既にinternされているのでidで区別できる
+        return tuple, id(value)
+    if type(value) is float:
+        return float, value.hex()
+    return type(value), value
+
+
+def _intern_value(value: typing.Any) -> typing.Any:
+    """文字列とtupleをinternした値を返す. 辞書の場合は値を置き換える"""
+    if type(value) is str:
+        return sys.intern(value)
+    if type(value) is tuple:
+        value = tuple([_intern_value(v) for v in value])
+        try:
+            return _interned_tuples.intern(tuple([_intern_key(v) for v in value]), value)
+        except TypeError:
+            # hashできない要素を含む場合はinternしない
+            return value
+    if type(value) is dict:
+        for k, v in value.items():
+            value[k] = _intern_value(v)
+    return value
+
+
+_field_names_cache: typing.Dict[type, typing.Optional[typing.Tuple[str, ...]]] = {}
+
+
+def _dataclass_field_names(obj: typing.Any) -> typing.Optional[typing.Tuple[str, ...]]:
+    """dataclassのインスタンスならfield名を定義順で返す. それ以外はNone"""
+    cls = type(obj)
+    try:
+        return _field_names_cache[cls]
+    except KeyError:
+        pass
+    names = tuple(f.name for f in dataclasses.fields(cls)) if dataclasses.is_dataclass(cls) else None
+    _field_names_cache[cls] = names
+    return names
+
+
+def _iter_leaves(config: typing.Any) -> typing.Iterator[typing.Tuple[str, typing.Any]]:
+    """Configの全てのleafの (path, 値) を定義順に返す"""
+    stack = [('', config)]
+    while len(stack) > 0:
+        path, value = stack.pop()
+        names = _dataclass_field_names(value)
+        if names is None:
+            yield path, value
+            continue
+        stack.extend(reversed([(f'{path}/{k}', getattr(value, k)) for k in names]))
+
+
+def _iter_diff(a: typing.Any, b: typing.Any, path: str = '') \
+        -> typing.Iterator[typing.Tuple[str, typing.Any, typing.Any]]:
+    """
+    2つのConfigをその場で比較し、値が異なるleafの (path, aの値, bの値) を定義順に返す
+    同一オブジェクトの部分木と、lazyモードで双方とも未作成の部分木は辿らない
+    """
+    stack = [(path, a, b)]
+    while len(stack) > 0:
+        path, a, b = stack.pop()
+        if a is b:
+            continue
+        names = _dataclass_field_names(a)
+        if names is None or names != _dataclass_field_names(b):
+            if a != b:
+                yield path, a, b
+            continue
+        lazy_fields = getattr(type(a), '_lazy_fields', None) if type(a) is type(b) else None
+        children = []
+        for k in names:
+            if lazy_fields is not None and k in lazy_fields \
+                    and not _is_materialized(a, k) and not _is_materialized(b, k):
+                continue
+            children.append((f'{path}/{k}', getattr(a, k), getattr(b, k)))
+        stack.extend(reversed(children))
+
+
+def _to_dict(config: typing.Any) -> typing.Dict[str, typing.Any]:
+    """
+    dataclasses.asdict と異なりleafの値はコピーしない. lazyモードで未作成の部分木はdefault値なので含めない
+    """
+    d = {}
+    lazy_fields = getattr(type(config), '_lazy_fields', None)
+    for k in _dataclass_field_names(config):
+        if lazy_fields is not None and k in lazy_fields and not _is_materialized(config, k):
+            continue
+        v = getattr(config, k)
+        d[k] = _to_dict(v) if _dataclass_field_names(v) is not None else v
+    return d
+
+
+# magic (7byte) + format version (1byte) + marshal.dumps((default hash, values, origins))
+_SNAPSHOT_MAGIC = b'CONFIGR'
+_SNAPSHOT_VERSION = 2
+
+
+def _dump_snapshot(config: ConfigBase) -> bytes:
+    import marshal
+
+    # ファイル以外の上書き元 ('cli', 'env' など) は文字列のまま復元するため、pathかどうかも保存する
+    origins = {k: (str(v), isinstance(v, pathlib.PurePath))
+               for k, v in (getattr(config, '_origins', None) or {}).items()}
+    body = marshal.dumps((config._default_file_and_hash()[1], _to_dict(config), origins))
+    return _SNAPSHOT_MAGIC + bytes([_SNAPSHOT_VERSION]) + body
+
+
+# このプロセスがpublishした共有メモリの名前. attachしてもresource trackerの登録を取り消さない
+_published_names: typing.Set[str] = set()
+
+
+def _load_snapshot(snapshot_path: pathlib.Path) \
+        -> typing.Tuple[str, typing.Dict[str, typing.Any], typing.Dict[str, TypePathLike]]:
+    import mmap
+
+    with snapshot_path.open('rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise RuntimeError(f'{snapshot_path} is not a configer snapshot')
+        # ファイルをコピーせずにmmapした領域から直接復元する
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return _parse_snapshot(view, snapshot_path)
+
+
+def _parse_snapshot(buffer: memoryview, source: typing.Any) \
+        -> typing.Tuple[str, typing.Dict[str, typing.Any], typing.Dict[str, TypePathLike]]:
+    import marshal
+
+    version = buffer[len(_SNAPSHOT_MAGIC)] if len(buffer) > len(_SNAPSHOT_MAGIC) + 1 else None
+    if buffer[:len(_SNAPSHOT_MAGIC)] != _SNAPSHOT_MAGIC or version not in (1, _SNAPSHOT_VERSION):
+        raise RuntimeError(f'{source} is not a configer snapshot')
+    # marshal.loads は末尾の余分なbyte (共有メモリのページ境界までの0埋め) を無視する
+    with buffer[len(_SNAPSHOT_MAGIC) + 1:] as body:
+        default_hash, params, origins = marshal.loads(body)
+    if version == 1:
+        # version 1 は上書き元を全てファイルのpathとして保存していた
+        return default_hash, params, {k: pathlib.Path(v) for k, v in origins.items()}
+    return default_hash, params, {k: pathlib.Path(v) if is_path else v for k, (v, is_path) in origins.items()}
+
+
+class _SweepValue(typing.NamedTuple):
+    """sweepで書き換える値. 書き換える値そのものが辞書の場合と区別する"""
+    value: typing.Any
+
+
+def _replace_fields(config: typing.Any, overrides: typing.Mapping[str, typing.Any]) -> typing.Any:
+    """
+    overridesのキーだけを書き換えたコピーを返す. コピーするのは書き換えるキーまでの経路上のインスタンスだけで、
+    それ以外の部分木は元のインスタンスを共有する
+    """
+    cls = type(config)
+    new_config = object.__new__(cls)
+    lazy_fields = getattr(cls, '_lazy_fields', None)
+    for k in _dataclass_field_names(config):
+        if k in overrides:
+            override = overrides[k]
+            if isinstance(override, _SweepValue):
+                value = override.value
+            else:
+                value = _replace_fields(getattr(config, k), override)
+        elif lazy_fields is not None and k in lazy_fields and not _is_materialized(config, k):
+            continue
+        else:
+            value = getattr(config, k)
+        object.__setattr__(new_config, k, value)
+    return new_config
+
+
+class _InlineOverride:
+    """update_with で渡された上書き. ファイルの代わりに _sources に記録する"""
+
+    def __init__(self, origin: str, params: typing.Dict[str, typing.Any], keys: typing.List[str]):
+        self.origin = origin
+        self.params = params
+        self.keys = keys
+
+    def digest(self) -> typing.Tuple[str, str]:
+        import hashlib
+
+        return self.origin, hashlib.blake2b(repr(list(_get_items(self.params))).encode(), digest_size=16).hexdigest()
+
+
+def _source_origin(source: typing.Union[pathlib.Path, _InlineOverride]) -> TypePathLike:
+    return source.origin if isinstance(source, _InlineOverride) else source
+
+
+def _iter_dotted(d: typing.Mapping[str, typing.Any], parent_key: str = '') \
+        -> typing.Iterator[typing.Tuple[str, typing.Any]]:
+    """'.'区切りのキーを含む辞書から (キーのpath, 値) を返す. listはtupleに変換する"""
+    for k, v in d.items():
+        key = f'{parent_key}/{k.replace(".", "/")}'
+        if isinstance(v, dict) and len(v) > 0:
+            yield from _iter_dotted(v, key)
         else:
-            keys.append(f'{parent_key}/{k}')
-    return keys
+            yield key, _list_to_tuple(v) if isinstance(v, list) else v
+
+
+def _list_to_tuple(value: typing.List[typing.Any]) -> typing.Tuple[typing.Any, ...]:
+    return tuple(_list_to_tuple(v) if isinstance(v, list) else v for v in value)
+
+
+_BOOL_STRINGS = {'true': True, 'yes': True, 'on': True, '1': True,
+                 'false': False, 'no': False, 'off': False, '0': False}
+
+
+def _materialize(obj: typing.Any, name: str) -> typing.Any:
+    """lazyモードで生成されたdataclassの __getattr__ から呼ばれ、初めて参照された部分木をdefault値で作りキャッシュする"""
+    child_class = type(obj)._lazy_fields.get(name)
+    if child_class is None:
+        raise AttributeError(f"'{type(obj).__name__}' object has no attribute '{name}'")
+    value = child_class()
+    object.__setattr__(obj, name, value)
+    return value
+
+
+def _is_materialized(obj: typing.Any, name: str) -> bool:
+    # object.__getattribute__ は __getattr__ を呼ばないので部分木を作らずに確認できる
+    try:
+        object.__getattribute__(obj, name)
+    except AttributeError:
+        return False
+    return True
+
+
+def _invalid_type_error(key: str, expected_type: str, value: typing.Any, origins: typing.Dict[str, TypePathLike]) \
+        -> InvalidTypeError:
+    """生成された検査関数から呼ばれ、キーのpathと値を設定したファイルを含むエラーを作る"""
+    if type(value) == tuple:
+        actual_type = f"Tuple[{[str(type(c)) for c in value]}]"
+    else:
+        actual_type = str(type(value))
+    return InvalidTypeError(key, expected_type, actual_type, origins.get(key))
+
+
+def _to_path(path: str) -> str:
+    """'.'区切りのキーを'/'区切りのpathにする"""
+    return path if path.startswith('/') else '/' + path.replace('.', '/')
+
+
+def _to_path_list(file_paths: typing.Union[TypePathLike, typing.List[TypePathLike], typing.Tuple[TypePathLike]]) \
+        -> typing.List[pathlib.Path]:
+    if not isinstance(file_paths, list) and not isinstance(file_paths, tuple):
+        file_paths = [file_paths]
+    return list(map(pathlib.Path, file_paths))
+
+
+def _load_override_file(file: pathlib.Path, parsed_file_cache: typing.Optional[ParsedFileCache] = None) \
+        -> typing.Tuple[typing.Dict[str, typing.Any], typing.List[str]]:
+    """
+    上書きファイルを読み込み、listをtupleに変換した辞書とそのキーの一覧を返す
+    ConfigGenerator.update_by から別スレッド / 別プロセスで呼ばれる
+    """
+    assert isinstance(file, pathlib.Path), f'file expected: pathlib.Path, actual {type(file)}'
+    assert file.is_file(), f'{file} is not a valid file path'
+    # Load Setting
+    params = load_setting_file(file, parsed_file_cache)
+
+    def list_to_tuple(d: typing.MutableMapping[str, typing.Any]):
+        for k, v in d.items():
+            if isinstance(v, list):
+                d[k] = tuple(v)
+            if isinstance(v, dict):
+                list_to_tuple(v)
+
+    list_to_tuple(params)
+
+    return params, _get_keys(params)
+
+
+def _get_keys(d: typing.Mapping[str, typing.Any], parent_key: str = '') -> typing.List[str]:
+    return [key for key, _ in _get_items(d, parent_key)]
+
+
+def _get_items(d: typing.Mapping[str, typing.Any], parent_key: str = '') \
+        -> typing.Iterator[typing.Tuple[str, typing.Any]]:
+    """leafの (キーのpath, 値) を定義順に返す. 再帰せずに明示的なstackで辿る"""
+    stack = [(parent_key, iter(d.items()))]
+    while stack:
+        parent_key, items = stack[-1]
+        for k, v in items:
+            if isinstance(v, dict):
+                stack.append((f'{parent_key}/{k}', iter(v.items())))
+                break
+            yield f'{parent_key}/{k}', v
+        else:
+            stack.pop()
+
+
+def _copy_dicts(d: typing.Mapping[str, typing.Any]) -> typing.Dict[str, typing.Any]:
+    """辞書の部分だけをコピーする (leafの値は共有する)"""
+    return {k: _copy_dicts(v) if isinstance(v, dict) else v for k, v in d.items()}
 
 
 def _update_nested_dict(base_dict, new_dict):
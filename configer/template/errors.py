@@ -9,10 +9,13 @@ class ConfigerError(Exception):
 
 
 class ConflictError(ConfigerError):
-    def __init__(self, key_and_origins: typing.Tuple[typing.Tuple[str, TypePathLike], typing.Tuple[str, TypePathLike]]):
+    def __init__(self,
+                 key_and_origins: typing.Tuple[typing.Tuple[str, TypePathLike], typing.Tuple[str, TypePathLike]],
+                 *other_key_and_origins: typing.Tuple[typing.Tuple[str, TypePathLike], typing.Tuple[str, TypePathLike]]):
+        self.conflicts = (key_and_origins,) + other_key_and_origins
         super(ConflictError, self).__init__(
-            f"Detect conflict. Check {key_and_origins[0][0]} in {key_and_origins[0][1]}"
-            f" and {key_and_origins[1][0]} in {key_and_origins[1][1]}")
+            "Detect conflict. " + "; ".join([f"Check {k1} in {o1} and {k2} in {o2}"
+                                             for (k1, o1), (k2, o2) in self.conflicts]))
 
 
 class ChangeDefaultError(ConfigerError):
@@ -22,5 +25,8 @@ class ChangeDefaultError(ConfigerError):
 
 
 class InvalidTypeError(ConfigerError):
-    def __init__(self, key: str, expected_type: str, actual_type: str):
-        super(InvalidTypeError, self).__init__(f"{key} is expected {expected_type}, actual {actual_type}")
+    def __init__(self, key: str, expected_type: str, actual_type: str, origin: typing.Optional[TypePathLike] = None):
+        message = f"{key} is expected {expected_type}, actual {actual_type}"
+        if origin is not None:
+            message += f" (set by {origin})"
+        super(InvalidTypeError, self).__init__(message)
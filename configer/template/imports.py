@@ -1,9 +1,7 @@
+import os
+import sys
+import time
 import typing
+import operator
 import dataclasses
 import pathlib
-import toml
-import yaml
-import random
-import hashlib
-import functools
-from clint import textui
@@ -0,0 +1,7 @@
+import typing
+import operator
+import dataclasses
+
+from configer.runtime import TypePathLike, ConfigerError, ConflictError, ChangeDefaultError, InvalidTypeError
+from configer.runtime import ConfigBase, ConfigDiff, ConfigGeneratorBase, ConfigHandle, GenerateCache
+from configer.runtime import _check_unknown_keys, _build_child, _invalid_type_error, _materialize, _is_materialized
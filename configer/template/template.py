@@ -1,17 +1,29 @@
 
-from typing import List
+from typing import List, Optional, Tuple
+from functools import lru_cache
 from pathlib import Path
 
 from prestring.python import PythonModule
 
 
-def generate(my_dataclasses: List[str], params: List[str], default_file: str, default_hash: str):
+def generate(my_dataclasses: List[str], params: List[str], default_file: str, default_hash: str,
+             hash_algorithm: str = 'md5', validators: Optional[List[str]] = None, path_table: str = '',
+             config_methods: Optional[List[str]] = None,
+             dataclass_decorator: str = '@dataclasses.dataclass(frozen=True)', runtime: str = 'embedded'):
+    """
+    :param runtime: 'embedded' なら共通処理 (errors.py, utils.py, core.py) を埋め込み、
+                    'shared' なら configer.runtime からimportする
+    """
+    assert runtime in ('embedded', 'shared'), runtime
     m = PythonModule(width=80)
     m.stmt("""# Generated From configer
 # Please do not modify.
 # If you want to do, edit your default.yml, and run `configer update` on your terminal.""")
 
-    embedding_file(m, Path(__file__).parent / 'imports.py')
+    if runtime == 'shared':
+        embedding_file(m, Path(__file__).parent / 'imports_shared.py')
+    else:
+        embedding_file(m, Path(__file__).parent / 'imports.py')
     m.sep()
     with m.def_('get_default_file_and_hash'):
         try:
@@ -19,35 +31,39 @@ def generate(my_dataclasses: List[str], params: List[str], default_file: str, de
         except ValueError:
             path = Path(default_file).absolute()
         m.stmt(f'return \'{path}\',\\{m.newline}{m.indent*2}\'{default_hash}\'')
+    with m.def_('get_default_hash_algorithm'):
+        m.stmt(f'return \'{hash_algorithm}\'')
 
-    embedding_file(m, Path(__file__).parent / 'type_hint.py')
-    m.sep()
-    embedding_file(m, Path(__file__).parent / 'errors.py')
-    m.sep()
-    embedding_file(m, Path(__file__).parent / 'utils.py')
-    m.sep()
+    if runtime == 'embedded':
+        embedding_file(m, Path(__file__).parent / 'type_hint.py')
+        m.sep()
+        embedding_file(m, Path(__file__).parent / 'errors.py')
+        m.sep()
+        embedding_file(m, Path(__file__).parent / 'utils.py')
+        m.sep()
 
     for my_dataclass in my_dataclasses:
         m.stmt(my_dataclass)
         m.stmt(m.newline)
 
-    m.stmt("@dataclasses.dataclass(frozen=True)")
+    m.stmt(dataclass_decorator)
     with m.class_("_Config"):
-        post_inits = []
         for key in params:
-            if key.endswith('dataclasses.field(init=False)'):
-                s = key.split(' ')
-                key_name = s[0][:-1]
-                class_name = s[1]
-                post_inits.append(f"super().__setattr__('{key_name}', {class_name}())")
             m.stmt(key)
         m.sep()
-        if len(post_inits):
-            with m.def_('__post_init__', 'self'):
-                for post_init in post_inits:
-                    m.stmt(post_init, end="")
-            m.body.pop()
-    embedding_file(m, Path(__file__).parent / 'core.py')
+        for line in config_methods or []:
+            m.stmt(line)
+
+    for validator in validators or []:
+        m.stmt(validator)
+        m.stmt(m.newline)
+    if path_table:
+        m.stmt(path_table)
+        m.stmt(m.newline)
+    if runtime == 'embedded':
+        embedding_file(m, Path(__file__).parent / 'core.py')
+        m.sep()
+    embedding_file(m, Path(__file__).parent / 'binding.py')
 
     return m
 
@@ -61,13 +77,24 @@ def embedding_file(python_module: PythonModule, path: Path):
 
     Returns:
 
+    """
+    for line in included_lines(path):
+        python_module.append(line)
+
+
+@lru_cache(maxsize=None)
+def included_lines(path: Path) -> Tuple[str, ...]:
+    """
+    埋め込むテンプレートの行. 複数のファイルを生成する場合も各テンプレートは一度だけ読む
     """
     with path.open("r") as f:
         raw_lines: List[str] = f.readlines()
-        include_line = True
-        for raw_line in raw_lines:
-            if raw_line.startswith('# no include'):
-                include_line = not include_line
-                continue
-            if include_line:
-                python_module.append(raw_line)
+    lines = []
+    include_line = True
+    for raw_line in raw_lines:
+        if raw_line.startswith('# no include'):
+            include_line = not include_line
+            continue
+        if include_line:
+            lines.append(raw_line)
+    return tuple(lines)
@@ -1,6 +1,8 @@
 # no include
+import os
+import time
+import typing
 import pathlib
-import hashlib
 
 
 # no include
@@ -10,11 +12,196 @@ def hash_md5(setting_file_path: pathlib.Path) -> str:
     :param setting_file_path:
     :return:
     """
+    return hash_file(setting_file_path, 'md5')
+
+
+def hash_file(setting_file_path: pathlib.Path, algorithm: str = 'md5') -> str:
+    """
+    :param setting_file_path:
+    :param algorithm: hashlib.new に渡すアルゴリズム名 (md5, blake2b, ...)
+    :return:
+    """
+    import hashlib
+
     block_size = 65536
-    hasher = hashlib.md5()
-    with setting_file_path.open('rb') as f:
+    hasher = hashlib.new(algorithm)
+    with open(setting_file_path, 'rb') as f:
         buf = f.read(block_size)
         while len(buf) > 0:
             hasher.update(buf)
             buf = f.read(block_size)
     return hasher.hexdigest()
+
+
+class FingerprintCache:
+    """
+    (path, size, mtime_ns, inode) をキーにファイルのhashを保持し、変更のないファイルの再hashを省略する
+    """
+    # mtimeがこの秒数以内のファイルは同じtick内で再度書き換えられる可能性があるのでキャッシュしない
+    racy_window_ns = 2 * 10 ** 9
+
+    def __init__(self):
+        self._entries: typing.Dict[str, typing.Tuple[typing.Tuple[int, int, int], typing.Dict[str, str]]] = {}
+
+    @staticmethod
+    def stat(file_path: pathlib.Path) -> typing.Tuple[int, int, int]:
+        st = os.stat(file_path)
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
+    def trusted_stat(self, file_path: pathlib.Path) -> typing.Optional[typing.Tuple[int, int, int]]:
+        """
+        :return: 直後に書き換えられても検出できるだけ古いファイルのstat. 新しすぎる場合はNone
+        """
+        current_stat = self.stat(file_path)
+        if time.time_ns() - current_stat[1] < self.racy_window_ns:
+            return None
+        return current_stat
+
+    def digest(self, file_path: pathlib.Path, algorithm: str = 'md5', strict: bool = False) -> str:
+        """
+        :param file_path:
+        :param algorithm:
+        :param strict: Trueならキャッシュを使わずに必ずファイル全体をhashする
+        :return:
+        """
+        key = os.path.abspath(file_path)
+        current_stat = self.stat(file_path)
+        entry = self._entries.get(key)
+        if not strict and entry is not None and entry[0] == current_stat and algorithm in entry[1]:
+            return entry[1][algorithm]
+        digest = hash_file(file_path, algorithm)
+        self.seed(file_path, current_stat, algorithm, digest)
+        return digest
+
+    def seed(self, file_path: pathlib.Path, file_stat: typing.Sequence[int], algorithm: str, digest: str) -> bool:
+        """
+        既知の (stat, hash) を登録する. statが現在のファイルと一致しない場合は登録しない
+        :return: 登録できたかどうか
+        """
+        file_stat = tuple(file_stat)
+        if file_stat != self.trusted_stat(file_path):
+            return False
+        key = os.path.abspath(file_path)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != file_stat:
+            entry = (file_stat, {})
+            self._entries[key] = entry
+        entry[1][algorithm] = digest
+        return True
+
+    def clear(self):
+        self._entries.clear()
+
+
+fingerprint_cache = FingerprintCache()
+
+
+def load_setting_file(setting_file_path: pathlib.Path, cache: typing.Optional['ParsedFileCache'] = None) \
+        -> typing.Any:
+    """
+    Toml / Yamlの設定ファイルを読み込む. cacheが与えられた場合はパース結果を再利用する
+    :param setting_file_path:
+    :param cache:
+    :return:
+    """
+    if setting_file_path.suffix not in ('.toml', '.yaml', '.yml'):
+        raise RuntimeError('Not support type (Toml / Yaml)')
+    if cache is not None:
+        return cache.load(setting_file_path, _parse_setting_file)
+    return _parse_setting_file(setting_file_path)
+
+
+def _parse_setting_file(setting_file_path: pathlib.Path) -> typing.Any:
+    with setting_file_path.open('r') as f:
+        if setting_file_path.suffix == '.toml':
+            import toml
+            return toml.load(f)
+        import yaml
+        # libyamlが使える場合はCで実装されたloaderを使う
+        return yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+
+class ParsedFileCache:
+    """
+    パース済みの設定ファイルを (ファイルのdigest, loaderのバージョン) をキーにcache_dirへpickleで保存する
+    合計サイズがmax_bytesを超えると最終アクセスが古いものから削除する
+    """
+    version = 1
+    env_name = 'CONFIGER_CACHE_DIR'
+
+    def __init__(self, cache_dir: typing.Union[str, pathlib.Path], max_bytes: int = 256 * 2 ** 20):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_env(cls) -> typing.Optional['ParsedFileCache']:
+        """環境変数 CONFIGER_CACHE_DIR が設定されていればそのディレクトリを使う"""
+        cache_dir = os.environ.get(cls.env_name)
+        if not cache_dir:
+            return None
+        return cls(cache_dir)
+
+    def key(self, setting_file_path: pathlib.Path) -> str:
+        import hashlib
+        import toml
+        import yaml
+
+        loader_version = f'{self.version}:{setting_file_path.suffix}:{yaml.__version__}:{toml.__version__}'
+        digest = fingerprint_cache.digest(setting_file_path, 'blake2b')
+        return hashlib.blake2b(f'{digest}:{loader_version}'.encode(), digest_size=20).hexdigest()
+
+    def load(self, setting_file_path: pathlib.Path, parse: typing.Callable[[pathlib.Path], typing.Any]) \
+            -> typing.Any:
+        import pickle
+
+        blob_path = self.cache_dir / f'{self.key(setting_file_path)}.pickle'
+        try:
+            with blob_path.open('rb') as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, AttributeError, ImportError, IndexError,
+                TypeError):
+            # 無い、または壊れたblobはキャッシュに無いものとしてパースし直す
+            pass
+        else:
+            try:
+                # evictで最終アクセスとして使う. 読み込み専用のディレクトリでも読めたものはそのまま使う
+                os.utime(str(blob_path))
+            except OSError:
+                pass
+            return data
+        data = parse(setting_file_path)
+        self._store(blob_path, data)
+        return data
+
+    def _store(self, blob_path: pathlib.Path, data: typing.Any):
+        import pickle
+        import tempfile
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.cache_dir), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, str(blob_path))
+        except OSError:
+            # キャッシュに書き込めなくても読み込み自体は成功させる
+            return
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for blob_path in self.cache_dir.glob('*.pickle'):
+            try:
+                st = blob_path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, blob_path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, blob_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                blob_path.unlink()
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,95 @@
+import io
+import os
+import json
+import stat
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+from argparse import Namespace
+from pathlib import Path
+
+import yaml
+
+from configer import command
+from configer.command import Configer
+
+
+class TestCommand(unittest.TestCase):
+    def setUp(self):
+        self.setting_dir = Path(__file__).parents[1] / 'tests' / 'setting'
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp_dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def test_create_many(self):
+        options = {'slots': False, 'lazy': False, 'runtime': 'embedded'}
+        jobs = [(self.setting_dir / 'default.yml', Path('out') / 'default.py', 'md5', options),
+                (self.setting_dir / 'default.toml', Path('out') / 'default_toml.py', 'md5', options)]
+        results = Configer.create_many(jobs, max_workers=2)
+        self.assertListEqual([created for _, created in results], [True, True])
+        self.assertTrue((Path('out') / 'default.py').is_file())
+        self.assertTrue((Path('out') / 'default_toml.py').is_file())
+
+        with command.lock_file_path.open('r') as f:
+            contents = yaml.safe_load(f)
+        self.assertSetEqual(set(contents), {str(job[0]) for job in jobs})
+        self.assertEqual(contents[str(jobs[0][0])]['output'], str(jobs[0][1]))
+        self.assertListEqual(list(Path('.').glob('.config.lock.*')), [])
+        # lockの権限は一時ファイル (0600) ではなくumaskに従い、既存のlockの権限は保つ
+        umask = os.umask(0o022)
+        os.umask(umask)
+        self.assertEqual(stat.S_IMODE(command.lock_file_path.stat().st_mode), 0o666 & ~umask)
+        os.chmod(str(command.lock_file_path), 0o640)
+        command.update_lock({})
+        self.assertEqual(stat.S_IMODE(command.lock_file_path.stat().st_mode), 0o640)
+
+        # 変更が無ければ生成しない
+        results = Configer.create_many(jobs)
+        self.assertListEqual([created for _, created in results], [False, False])
+        os.remove(str(jobs[1][1]))
+        results = Configer.create_many(jobs)
+        self.assertListEqual([created for _, created in results], [False, True])
+        results = Configer.create_many(jobs[:1], force=True)
+        self.assertListEqual([created for _, created in results], [True])
+
+    def test_load_manifest(self):
+        manifest_path = Path('manifest.yml')
+        manifest_path.write_text('a.yml: a.py\nb.yml: b.py\n')
+        self.assertListEqual(Configer.load_manifest(manifest_path),
+                             [(Path('a.yml'), Path('a.py')), (Path('b.yml'), Path('b.py'))])
+        manifest_path.write_text('- setting: a.yml\n  output: a.py\n')
+        self.assertListEqual(Configer.load_manifest(manifest_path), [(Path('a.yml'), Path('a.py'))])
+
+    def test_validate_files(self):
+        groups = [[self.setting_dir / 'models.yml'],
+                  [self.setting_dir / 'models.yml', self.setting_dir / 'optimizer.yml'],
+                  [self.setting_dir / 'optimizer_type_error.yml'],
+                  [self.setting_dir / 'models_conflict_with_optimizer.yml', self.setting_dir / 'optimizer.yml']]
+        results = list(Configer.validate_files(self.setting_dir / 'default.yml', groups, max_workers=1))
+        errors = [errors for _, errors in results]
+        self.assertListEqual(errors[:2], [[], []])
+        self.assertIn('/optimizer/adam/alpha', errors[2][0])
+        self.assertIn('Detect conflict', errors[3][-1])
+
+        Configer.create_from_file(self.setting_dir / 'default.yml', Path('config.py'))
+        parallel = Configer.validate_files(Path('config.py'), groups * 10, max_workers=2, chunk_size=4)
+        self.assertListEqual(sorted(map(str, errors * 10)), sorted(str(errors) for _, errors in parallel))
+
+    def test_validate(self):
+        bad = str(self.setting_dir / 'optimizer_type_error.yml')
+        args = Namespace(schema=str(self.setting_dir / 'default.yml'),
+                         files=[bad, bad, str(self.setting_dir / 'models.yml')], jobs=1)
+        stdout = io.StringIO()
+        with mock.patch('configer.command.puts'), contextlib.redirect_stdout(stdout), \
+                self.assertRaises(SystemExit) as cm:
+            Configer.validate(args)
+        self.assertEqual(cm.exception.code, 1)
+        summary = json.loads(stdout.getvalue().splitlines()[-1])
+        self.assertEqual((summary['checked'], summary['passed'], summary['failed']), (3, 1, 2))
+        self.assertListEqual([error['group'] for error in summary['errors']], [bad, bad])
+        self.assertIn('/optimizer/adam/alpha', summary['errors'][0]['errors'][0])
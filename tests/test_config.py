@@ -1,5 +1,12 @@
 import os
+import asyncio
+import marshal
+import sys
+import subprocess
+import dataclasses
+import tempfile
 import unittest
+from unittest import mock
 from pathlib import Path
 from configer.command import Configer
 
@@ -17,6 +24,10 @@ class TestConfig(unittest.TestCase):
         self.out_path = project_dir / 'tests' / 'config.py'
         Configer.create_from_file(self.config_path, self.out_path)
 
+    def tearDown(self):
+        if self.out_path.is_file():
+            os.remove(str(self.out_path))
+
     def test_load(self):
         from tests.config import ConfigGenerator, ConflictError, InvalidTypeError, ChangeDefaultError
 
@@ -38,10 +49,10 @@ class TestConfig(unittest.TestCase):
             [self.config_models_conflict_path, self.config_optimizer_path]
         )
 
-        self.assertRaises(
-            InvalidTypeError,
-            ConfigGenerator().update_by(self.config_optimizer_type_error_path).generate,
-        )
+        with self.assertRaises(InvalidTypeError) as cm:
+            ConfigGenerator().update_by(self.config_optimizer_type_error_path).generate()
+        self.assertIn('/optimizer/adam/alpha', str(cm.exception))
+        self.assertIn(str(self.config_optimizer_type_error_path), str(cm.exception))
 
         self.assertRaises(
             ChangeDefaultError,
@@ -63,3 +74,438 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(config, config2)
         os.remove(str(self.out_path))
         os.remove(str(out_file))
+
+    def test_conflict(self):
+        from tests.config import ConfigGenerator, ConflictError, _KeyTrie
+
+        key_trie = _KeyTrie()
+        self.assertListEqual(key_trie.insert({'optimizer': {'lr': 0.1}}, 'a.yml'), [])
+        self.assertListEqual(key_trie.insert({'optimizer': {'lr_decay': 0.9}}, 'b.yml'), [])
+        self.assertListEqual(
+            key_trie.insert({'optimizer': 1., 'models': {'base_mlp': {'in_channels': 3}}}, 'c.yml'),
+            [(('/optimizer/lr', 'a.yml'), ('/optimizer', 'c.yml')),
+             (('/optimizer/lr_decay', 'b.yml'), ('/optimizer', 'c.yml'))]
+        )
+
+        with self.assertRaises(ConflictError) as cm:
+            ConfigGenerator().update_by(
+                [self.config_models_path, self.config_models_conflict_path, self.config_optimizer_path])
+        origins = {(str(o1), str(o2)) for (_, o1), (_, o2) in cm.exception.conflicts}
+        self.assertSetEqual(origins, {(str(self.config_models_path), str(self.config_models_conflict_path)),
+                                      (str(self.config_models_conflict_path), str(self.config_optimizer_path))})
+
+    def test_parallel_update_by(self):
+        from tests.config import ConfigGenerator, ConflictError
+
+        files = [self.config_models_path, self.config_optimizer_path]
+        serial = ConfigGenerator().update_by(files)
+        for use_processes in (False, True):
+            parallel = ConfigGenerator().update_by(files, max_workers=2, use_processes=use_processes)
+            self.assertDictEqual(parallel._update_params, serial._update_params)
+            self.assertDictEqual(parallel._origins, serial._origins)
+            self.assertEqual(parallel.generate(), serial.generate())
+
+        self.assertRaises(
+            ConflictError,
+            ConfigGenerator().update_by,
+            [self.config_models_conflict_path, self.config_optimizer_path],
+            max_workers=2
+        )
+
+    def test_validate_overrides_only(self):
+        from tests.config import ConfigGenerator, InvalidTypeError
+
+        files = [self.config_models_path, self.config_optimizer_path]
+        self.assertEqual(ConfigGenerator(validate_overrides_only=True).update_by(files).generate(),
+                         ConfigGenerator().update_by(files).generate())
+        self.assertRaises(
+            InvalidTypeError,
+            ConfigGenerator(validate_overrides_only=True).update_by(self.config_optimizer_type_error_path).generate,
+        )
+
+    def test_diff(self):
+        from tests.config import ConfigGenerator
+
+        config = ConfigGenerator().update_by([self.config_models_path, self.config_optimizer_path]).generate()
+        default_config = ConfigGenerator().generate()
+        self.assertListEqual(config.diff(config), [])
+        self.assertListEqual(config.diff(default_config.__class__()), config.diff(default_config))
+
+        diffs = {d.path: d for d in config.diff(default_config)}
+        self.assertListEqual(sorted(diffs), ['/models/base_mlp/in_channels', '/models/base_mlp/middle_channels',
+                                             '/models/base_mlp/middle_depth', '/models/base_mlp/out_channels',
+                                             '/optimizer/adam/alpha', '/optimizer/adam/beta'])
+        alpha = diffs['/optimizer/adam/alpha']
+        self.assertEqual((alpha.value, alpha.other_value), (0.2, 0.1))
+        self.assertEqual(alpha.origin, self.config_optimizer_path)
+        self.assertIsNone(alpha.other_origin)
+
+        with mock.patch('clint.textui.puts') as puts:
+            config.pprint(wait=False)
+        self.assertIn(f'changed by {self.config_optimizer_path}', ''.join(str(c.args[0]) for c in puts.call_args_list))
+
+    def test_snapshot(self):
+        from tests.config import ConfigGenerator
+
+        files = [self.config_models_path, self.config_optimizer_path]
+        config = ConfigGenerator().update_by(files).generate()
+        snapshot_path = self.out_path.parent / 'snapshot.bin'
+        try:
+            config.save_as(snapshot_path, 'binary')
+            loaded = ConfigGenerator().load_snapshot(snapshot_path)
+            self.assertEqual(loaded, config)
+            self.assertEqual(loaded._origins, config._origins)
+            self.assertListEqual(loaded.diff(config), [])
+
+            # ファイル以外の上書き元は文字列のまま復元する
+            ConfigGenerator().update_by(files).update_with({'training.batchsize': 8}, origin='cli') \
+                .generate().save_as(snapshot_path, 'binary')
+            loaded = ConfigGenerator().load_snapshot(snapshot_path)
+            self.assertEqual(loaded.origin('training.batchsize'), 'cli')
+            self.assertEqual(loaded.origin('optimizer.adam.alpha'), self.config_optimizer_path)
+
+            # version 1 の形式では上書き元は全てファイル
+            origins = {k: str(v) for k, v in config._origins.items()}
+            snapshot_path.write_bytes(b'CONFIGR\x01' + marshal.dumps(
+                (config._default_file_and_hash()[1], dataclasses.asdict(config), origins)))
+            self.assertEqual(ConfigGenerator().load_snapshot(snapshot_path)._origins, config._origins)
+
+            config.save_as(snapshot_path, 'binary')
+            # default fileのhashが異なる場合は通常の検査を行う
+            data = snapshot_path.read_bytes().replace(config._default_file_and_hash()[1].encode(), b'0' * 32)
+            snapshot_path.write_bytes(data)
+            generator = ConfigGenerator(assert_identical_to_default=False)
+            self.assertEqual(generator.load_snapshot(snapshot_path), config)
+            snapshot_path.write_bytes(b'not a snapshot')
+            self.assertRaises(RuntimeError, ConfigGenerator().load_snapshot, snapshot_path)
+        finally:
+            if snapshot_path.is_file():
+                os.remove(str(snapshot_path))
+
+    def test_publish(self):
+        from tests.config import ConfigGenerator
+
+        config = ConfigGenerator().update_by([self.config_models_path, self.config_optimizer_path]).generate()
+        shm = config.publish()
+        try:
+            attached = ConfigGenerator().attach(shm.name)
+            self.assertEqual(attached, config)
+            self.assertEqual(attached._origins, config._origins)
+            # multiprocessing以外で起動されたプロセスが終了しても共有メモリは残り、所有者がunlinkする
+            code = 'from tests.config import ConfigGenerator; ' \
+                   f'print(ConfigGenerator().attach({shm.name!r}).optimizer.adam.alpha)'
+            for _ in range(2):
+                result = subprocess.run([sys.executable, '-c', code], cwd=str(Path(__file__).parents[1]),
+                                        capture_output=True, text=True)
+                self.assertEqual(result.returncode, 0, result.stderr)
+                self.assertEqual(result.stdout.strip(), str(config.optimizer.adam.alpha))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_watch(self):
+        from tests.config import ConfigGenerator, InvalidTypeError
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            override_path = Path(tmp_dir) / 'optimizer.yml'
+            override_path.write_text('optimizer:\n  adam:\n    alpha: 0.2\n')
+            training_path = Path(tmp_dir) / 'training.yml'
+            training_path.write_text('training:\n  batchsize: 16\n')
+            handle = ConfigGenerator().update_by([self.config_models_path, override_path, training_path]).watch()
+            changes = []
+            handle.on_change(lambda old, new: changes.append((old, new)))
+            self.assertEqual(handle.config.optimizer.adam.alpha, 0.2)
+            self.assertFalse(handle.poll())
+
+            override_path.write_text('optimizer:\n  adam:\n    alpha: 0.3\n')
+            self.assertTrue(handle.poll())
+            config = handle.config
+            self.assertEqual(config.optimizer.adam.alpha, 0.3)
+            self.assertEqual(config.models.base_mlp.in_channels, 3)
+            self.assertEqual(config._origins['/optimizer/adam/alpha'], override_path)
+            self.assertEqual(len(changes), 1)
+            self.assertIs(changes[0][1], config)
+
+            # 検査に失敗した場合はそれまでのConfigを保持する
+            override_path.write_text('optimizer:\n  adam:\n    alpha: wrong\n')
+            self.assertRaises(InvalidTypeError, handle.poll)
+            self.assertIs(handle.config, config)
+            # 別のファイルだけが変わっても、検査に失敗した値は反映しない
+            training_path.write_text('training:\n  batchsize: 32\n')
+            self.assertRaises(InvalidTypeError, handle.poll)
+            self.assertIs(handle.config, config)
+            override_path.write_text('optimizer:\n  adam:\n    alpha: 0.4\n')
+            self.assertTrue(handle.poll())
+            self.assertEqual(handle.config.optimizer.adam.alpha, 0.4)
+            self.assertEqual(handle.config.training.batchsize, 32)
+            self.assertEqual(len(changes), 2)
+
+    def test_watch_stat(self):
+        from tests.config import ConfigGenerator, fingerprint_cache
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            override_path = Path(tmp_dir) / 'optimizer.yml'
+            override_path.write_text('optimizer:\n  adam:\n    alpha: 0.2\n')
+            past = 1_000_000_000
+            os.utime(str(override_path), (past, past))
+            handle = ConfigGenerator().update_by([override_path]).watch()
+            # 変更のないファイルはpollごとにstat 1回だけ
+            with mock.patch.object(fingerprint_cache, 'stat', wraps=fingerprint_cache.stat) as stat:
+                self.assertFalse(handle.poll())
+                self.assertFalse(handle.poll())
+            self.assertEqual(stat.call_count, 2)
+
+    def test_async(self):
+        from tests.config import ConfigGenerator, ConflictError
+
+        files = [self.config_models_path, self.config_optimizer_path]
+
+        async def load(file_paths):
+            generator = await ConfigGenerator().aupdate_by(file_paths)
+            return await generator.agenerate()
+
+        config = asyncio.run(load(files))
+        expected = ConfigGenerator().update_by(files).generate()
+        self.assertEqual(config, expected)
+        self.assertEqual(config._origins, expected._origins)
+        with self.assertRaises(ConflictError) as cm:
+            asyncio.run(load([self.config_models_conflict_path, self.config_optimizer_path]))
+        with self.assertRaises(ConflictError) as expected_cm:
+            ConfigGenerator().update_by([self.config_models_conflict_path, self.config_optimizer_path])
+        self.assertEqual(str(cm.exception), str(expected_cm.exception))
+
+    def test_sweep(self):
+        from tests.config import ConfigGenerator, InvalidTypeError
+
+        generator = ConfigGenerator().update_by(self.config_models_path)
+        base = generator.generate()
+        variants = list(generator.sweep({'optimizer.adam.alpha': [0.1, 0.2], 'training.batchsize': [32, 64, 128]}))
+        self.assertEqual(len(variants), 6)
+        self.assertListEqual([(v.optimizer.adam.alpha, v.training.batchsize) for v in variants],
+                             [(0.1, 32), (0.1, 64), (0.1, 128), (0.2, 32), (0.2, 64), (0.2, 128)])
+        for variant in variants:
+            self.assertIs(variant.models, base.models)
+            self.assertIsNot(variant.optimizer, base.optimizer)
+            self.assertEqual(variant.training.loss, base.training.loss)
+            self.assertEqual(variant._origins['/optimizer/adam/alpha'], 'sweep')
+            self.assertEqual(variant._origins['/models/base_mlp/in_channels'], self.config_models_path)
+        expected = ConfigGenerator().update_by(self.config_models_path).generate()
+        self.assertEqual(variants[0].models, expected.models)
+
+        self.assertRaises(InvalidTypeError, list, generator.sweep({'training.batchsize': [32, 'large']}))
+        self.assertRaises(AttributeError, list, generator.sweep({'training.unknown': [1]}))
+
+    def test_update_with(self):
+        from tests.config import ConfigGenerator, ConflictError, InvalidTypeError
+
+        config = ConfigGenerator() \
+            .update_by(self.config_models_path) \
+            .update_with({'models.base_mlp.in_channels': 5, 'optimizer': {'adam.alpha': 0.3}}) \
+            .generate()
+        self.assertEqual(config.models.base_mlp.in_channels, 5)
+        self.assertEqual(config.models.base_mlp.middle_channels, 128)
+        self.assertEqual(config.optimizer.adam.alpha, 0.3)
+        self.assertEqual(config._origins['/models/base_mlp/in_channels'], 'dict')
+        self.assertEqual(config._origins['/models/base_mlp/middle_channels'], self.config_models_path)
+
+        with self.assertRaises(ConflictError) as cm:
+            ConfigGenerator().update_with({'optimizer.adam.alpha': 0.3, 'optimizer': {'adam': {'alpha': 0.4}}})
+        self.assertIn('/optimizer/adam/alpha', str(cm.exception))
+
+        config = ConfigGenerator() \
+            .update_from_env(environ={'CONFIGER__TRAINING__BATCHSIZE': '16', 'CONFIGER_CACHE_DIR': '/tmp'}) \
+            .update_from_args(['--optimizer.adam.alpha=0.5', '--models.base_mlp.batch_norm', 'true',
+                               'use_model=other']) \
+            .generate()
+        self.assertEqual(config.training.batchsize, 16)
+        self.assertEqual(config.optimizer.adam.alpha, 0.5)
+        self.assertIs(config.models.base_mlp.batch_norm, True)
+        self.assertEqual(config.use_model, 'other')
+        self.assertEqual(config._origins['/training/batchsize'], 'env')
+        self.assertEqual(config._origins['/use_model'], 'cli')
+
+        with self.assertRaises(InvalidTypeError) as cm:
+            ConfigGenerator().update_from_args(['--training.batchsize=large'])
+        self.assertIn('cli', str(cm.exception))
+        self.assertRaises(AttributeError, ConfigGenerator().update_from_args, ['--training.unknown=1'])
+
+        # 同じキーを2回指定するとファイルと同様に衝突とする
+        with self.assertRaises(ConflictError) as cm:
+            ConfigGenerator().update_from_args(['--training.batchsize=1', '--training.batchsize', '2'])
+        self.assertIn('/training/batchsize in cli', str(cm.exception))
+        with self.assertRaises(ConflictError) as cm:
+            ConfigGenerator().update_from_env(
+                environ={'CONFIGER__TRAINING__BATCHSIZE': '1', 'CONFIGER__training__batchsize': '2'})
+        self.assertIn('/training/batchsize in env', str(cm.exception))
+
+    def test_get(self):
+        from tests.config import ConfigGenerator, _PATH_TABLE
+
+        config = ConfigGenerator().update_by(self.config_models_path).generate()
+        self.assertEqual(config.get('/models/base_mlp/in_channels'), 3)
+        self.assertEqual(config.get('models.base_mlp.activation'), 'ReLU')
+        self.assertIs(config.get('optimizer.adam'), config.optimizer.adam)
+        self.assertEqual(config.origin('models.base_mlp.in_channels'), self.config_models_path)
+        self.assertIsNone(config.origin('/optimizer/adam/alpha'))
+        self.assertRaises(AttributeError, config.get, 'models.unknown')
+        self.assertEqual(_PATH_TABLE['/models/base_mlp/in_channels'][3], 32)
+        self.assertIs(_PATH_TABLE['/models'][3], dataclasses.MISSING)
+
+    def test_fingerprint(self):
+        from tests.config import ConfigGenerator
+
+        files = [self.config_models_path, self.config_optimizer_path]
+        config = ConfigGenerator().update_by(files).generate()
+        same = ConfigGenerator().update_by(list(reversed(files))).generate()
+        default_config = ConfigGenerator().generate()
+        self.assertEqual(config.fingerprint(), same.fingerprint())
+        self.assertNotEqual(config.fingerprint(), default_config.fingerprint())
+        self.assertEqual(config, same)
+        self.assertNotEqual(config, default_config)
+        self.assertEqual(len({config: 1, same: 2, default_config: 3}), 2)
+
+        # 別プロセスでも同じ値になる
+        code = 'from tests.config import ConfigGenerator; print(ConfigGenerator().generate().fingerprint())'
+        out = subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.PIPE,
+                             cwd=str(Path(__file__).parents[1])).stdout.decode().strip()
+        self.assertEqual(out, default_config.fingerprint())
+
+    def test_generate_cache(self):
+        from tests.config import ConfigGenerator, ConflictError, ChangeDefaultError, GenerateCache
+
+        cache = GenerateCache(maxsize=2)
+        files = [self.config_models_path, self.config_optimizer_path]
+        config = ConfigGenerator(cache=cache).update_by(files).generate()
+        self.assertIs(ConfigGenerator(cache=cache).update_by(files).generate(), config)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(config, ConfigGenerator().update_by(files).generate())
+
+        other = ConfigGenerator(cache=cache).update_by(files).update_with({'training.batchsize': 8}).generate()
+        self.assertIsNot(other, config)
+        self.assertEqual(other.training.batchsize, 8)
+        self.assertIs(ConfigGenerator(cache=cache).update_by(files).update_with({'training.batchsize': 8}).generate(),
+                      other)
+        ConfigGenerator(cache=cache).generate()
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(len(cache), 2)
+
+        # 遅延した上書きの衝突はgenerateで検出する
+        generator = ConfigGenerator(cache=cache) \
+            .update_by([self.config_models_conflict_path, self.config_optimizer_path])
+        self.assertRaises(ConflictError, generator.generate)
+
+        # キャッシュしたConfigのoriginは、生成したgeneratorへの後からの上書きで変わらない
+        cache = GenerateCache()
+        generator = ConfigGenerator(cache=cache).update_by(self.config_models_path)
+        generator.generate()
+        generator.update_by(self.config_optimizer_path).generate()
+        config = ConfigGenerator(cache=cache).update_by(self.config_models_path).generate()
+        self.assertEqual(config.optimizer.adam.alpha, 0.1)
+        self.assertIsNone(config.origin('/optimizer/adam/alpha'))
+
+        # default fileが生成時から変わっていれば、キャッシュにあってもChangeDefaultError
+        cache = GenerateCache()
+        ConfigGenerator(cache=cache).generate()
+        default_file, _ = ConfigGenerator._default_file_and_hash()
+        with mock.patch.object(ConfigGenerator, '_default_file_and_hash', staticmethod(lambda: (default_file, ''))):
+            self.assertIsNotNone(ConfigGenerator(assert_identical_to_default=False, cache=cache).generate())
+            self.assertRaises(ChangeDefaultError, ConfigGenerator(cache=cache).generate)
+        self.assertEqual(cache.hits, 1)
+
+        cache = GenerateCache(ttl=0)
+        ConfigGenerator(cache=cache).generate()
+        ConfigGenerator(cache=cache).generate()
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (0, 2, 1))
+
+    def test_from_dict(self):
+        from tests.config import Config
+
+        self.assertEqual(Config._from_dict({}), Config())
+        config = Config._from_dict({'models': {'base_mlp': {'in_channels': 3}}})
+        self.assertEqual(config.models.base_mlp.in_channels, 3)
+        self.assertEqual(config.models.base_mlp.middle_channels, 64)
+        self.assertRaises(KeyError, Config._from_dict, {'models': {'unknown': 3}})
+
+    @unittest.skipIf(sys.version_info < (3, 10), 'dataclass(slots=True) requires Python 3.10+')
+    def test_slots(self):
+        slots_path = self.out_path.parent / 'config_slots.py'
+        Configer.create_from_file(self.config_path, slots_path, slots=True)
+        try:
+            from tests.config_slots import ConfigGenerator
+
+            files = [self.config_models_path, self.config_optimizer_path]
+            config = ConfigGenerator(intern_values=True).update_by(files).generate()
+            self.assertFalse(hasattr(config.models.base_mlp, '__dict__'))
+            self.assertEqual(config.models.base_mlp.in_channels, 3)
+            self.assertEqual(config.optimizer.adam.alpha, 0.2)
+        finally:
+            os.remove(str(slots_path))
+
+    def test_lazy(self):
+        lazy_path = self.out_path.parent / 'config_lazy.py'
+        Configer.create_from_file(self.config_path, lazy_path, lazy=True)
+        try:
+            from tests.config import ConfigGenerator
+            from tests.config_lazy import ConfigGenerator as LazyConfigGenerator, _is_materialized
+
+            config = LazyConfigGenerator().update_by([self.config_optimizer_path]).generate()
+            self.assertTrue(_is_materialized(config, 'optimizer'))
+            self.assertFalse(_is_materialized(config, 'models'))
+            self.assertEqual(config.models.base_mlp.in_channels, 32)
+            self.assertTrue(_is_materialized(config, 'models'))
+            self.assertRaises(dataclasses.FrozenInstanceError, setattr, config, 'use_model', 'other')
+            self.assertRaises(AttributeError, getattr, config, 'unknown')
+
+            files = [self.config_models_path, self.config_optimizer_path]
+            self.assertEqual(dataclasses.asdict(LazyConfigGenerator().update_by(files).generate()),
+                             dataclasses.asdict(ConfigGenerator().update_by(files).generate()))
+        finally:
+            os.remove(str(lazy_path))
+
+    def test_intern_values(self):
+        from tests.config import _intern_value
+
+        a = _intern_value({'k': ('relu', (1, 2.)), 's': ''.join(['re', 'lu'])})
+        b = _intern_value({'k': ('relu', (1, 2.)), 's': ''.join(['re', 'lu'])})
+        self.assertIs(a['k'], b['k'])
+        self.assertIs(a['s'], b['s'])
+        self.assertIsNot(_intern_value((1, 2.)), _intern_value((1., 2.)))
+        self.assertIs(type(_intern_value((1., 2.))[0]), float)
+
+    def test_intern_pool(self):
+        from tests.config import _intern_value, _interned_tuples
+
+        maxsize = _interned_tuples.maxsize
+        _interned_tuples.maxsize = 2
+        try:
+            a = _intern_value((1, 2))
+            self.assertIs(_intern_value((1, 2)), a)
+            _intern_value((3, 4))
+            _intern_value((5, 6))
+            # 最近使われていない (1, 2) は捨てられる
+            self.assertEqual(len(_interned_tuples), 2)
+            self.assertIsNot(_intern_value((1, 2)), a)
+        finally:
+            _interned_tuples.maxsize = maxsize
+            _interned_tuples.clear()
+
+    def test_shared_runtime(self):
+        shared_path = self.out_path.parent / 'config_shared.py'
+        Configer.create_from_file(self.config_path, shared_path, runtime='shared')
+        try:
+            from configer import runtime
+            from tests.config import ConfigGenerator
+            from tests.config_shared import ConfigGenerator as SharedConfigGenerator, ConflictError
+
+            self.assertIs(ConflictError, runtime.ConflictError)
+            files = [self.config_models_path, self.config_optimizer_path]
+            config = SharedConfigGenerator().update_by(files).generate()
+            self.assertEqual(dataclasses.asdict(config),
+                             dataclasses.asdict(ConfigGenerator().update_by(files).generate()))
+            self.assertRaises(
+                ConflictError,
+                SharedConfigGenerator().update_by,
+                [self.config_models_conflict_path, self.config_optimizer_path]
+            )
+        finally:
+            os.remove(str(shared_path))
@@ -21,3 +21,53 @@ class TestConfig(unittest.TestCase):
         self.assertTupleEqual(('typing.Tuple[int, int, float]', '(12, 32, 10.3)'), val_type)
         val_type = config_parser.get_type_and_default([12, 32, [20, 11.1]])
         self.assertEqual(('typing.Tuple[int, int, typing.Tuple[int, float]]', '(12, 32, (20, 11.1))'), val_type)
+
+    def test_check_expression(self):
+        config_parser = ConfigParser()
+        self.assertEqual(config_parser.check_expression(12, 'v'), 'type(v) is int')
+        self.assertEqual(config_parser.check_expression(None, 'v', negate=True), 'v is not None')
+        self.assertEqual(config_parser.check_expression([12, 1.], 'v'),
+                         '(type(v) is tuple and len(v) == 2 and isinstance(v[0], int) and isinstance(v[1], float))')
+        validate = {}
+        exec(config_parser.check_expression([1, [2, 'a']], 'v').join(['def check(v): return ', '']), validate)
+        self.assertTrue(validate['check']((3, (4, 'b'))))
+        self.assertFalse(validate['check']((3, (4, 5))))
+        self.assertFalse(validate['check']((3, )))
+
+    def test_shared_dataclass(self):
+        block = {'channels': 64, 'activation': 'relu'}
+        setting = {'layers': {f'block_{i}': dict(block) for i in range(300)},
+                   'head': {'block': dict(block), 'other': {'channels': 64, 'activation': 'gelu'}}}
+        deep = setting
+        for _ in range(1500):
+            deep['child'] = {}
+            deep = deep['child']
+        deep['value'] = 1
+
+        config_parser = ConfigParser()
+        params = [config_parser.parse(k, v, parent_class_name=None) for k, v in setting.items()]
+        self.assertIn('layers: Layers = dataclasses.field(init=False)', params)
+        # 同じ構造の部分木は最初のクラスを共有し、default値が異なる場合は別のクラスになる
+        self.assertEqual(config_parser.get_type_and_default(setting['layers']['block_299'])[0], 'LayersBlock0')
+        self.assertEqual(config_parser.get_type_and_default(setting['head']['block'])[0], 'LayersBlock0')
+        self.assertEqual(config_parser.get_type_and_default(setting['head']['other'])[0], 'HeadOther')
+        self.assertEqual(len([name for name in config_parser.dataclasses if name.startswith('LayersBlock')]), 1)
+        self.assertEqual(len(config_parser.dataclasses), 1500 + 4)
+
+    def test_variadic_tuple(self):
+        config_parser = ConfigParser()
+        weights = [0.5] * 50000
+        self.assertTupleEqual(config_parser.get_type_and_default(list(range(8))),
+                              ('typing.Tuple[int, ...]', '(0, 1, 2, 3, 4, 5, 6, 7)'))
+        self.assertEqual(config_parser.get_type_and_default(weights)[0], 'typing.Tuple[float, ...]')
+        self.assertEqual(config_parser.get_type_and_default([1] * 7 + [1.])[0],
+                         'typing.Tuple[int, int, int, int, int, int, int, float]')
+
+        expression = config_parser.check_expression(weights, 'v')
+        self.assertEqual(expression, '(type(v) is tuple and set(map(type, v)) <= {float})')
+        validate = {}
+        exec(config_parser.check_expression([1, ['a'] * 10], 'v').join(['def check(v): return ', '']), validate)
+        self.assertTrue(validate['check']((3, ('b', ) * 20)))
+        self.assertTrue(validate['check']((3, ())))
+        self.assertFalse(validate['check']((3, ('b', 1))))
+        self.assertFalse(validate['check']((3, ['b'])))
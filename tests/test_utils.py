@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from pathlib import Path
+from configer.template.utils import FingerprintCache, ParsedFileCache, hash_file, hash_md5, load_setting_file
+
+
+class TestFingerprintCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = Path(self.tmp_dir.name) / 'default.yml'
+        self.file_path.write_text('alpha: 0.1\n')
+        # 書き込み直後のファイルはキャッシュされないので mtime を過去にずらす
+        os.utime(str(self.file_path), ns=(0, 10 ** 9))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_digest(self):
+        cache = FingerprintCache()
+        self.assertEqual(cache.digest(self.file_path), hash_md5(self.file_path))
+        self.assertEqual(cache.digest(self.file_path, 'blake2b'), hash_file(self.file_path, 'blake2b'))
+
+        # statが同じなら再hashしない
+        stat = cache.stat(self.file_path)
+        self.assertTrue(cache.seed(self.file_path, stat, 'md5', 'cached'))
+        self.assertEqual(cache.digest(self.file_path), 'cached')
+        self.assertEqual(cache.digest(self.file_path, strict=True), hash_md5(self.file_path))
+
+        # 内容が変わればstatも変わる
+        self.file_path.write_text('alpha: 0.2\n')
+        self.assertEqual(cache.digest(self.file_path), hash_md5(self.file_path))
+        self.assertFalse(cache.seed(self.file_path, stat, 'md5', 'cached'))
+
+
+class TestParsedFileCache(unittest.TestCase):
+    def test_load(self):
+        project_dir = Path(__file__).parents[1]
+        setting_path = project_dir / 'tests' / 'setting' / 'default.yml'
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = ParsedFileCache(cache_dir)
+            expected = load_setting_file(setting_path)
+            self.assertDictEqual(load_setting_file(setting_path, cache), expected)
+
+            def parse(_):
+                raise AssertionError('cache hit must not parse the file')
+            self.assertDictEqual(cache.load(setting_path, parse), expected)
+            # 最終アクセスを更新できない (読み込み専用の) ディレクトリでもキャッシュを使う
+            with mock.patch('os.utime', side_effect=PermissionError):
+                self.assertDictEqual(cache.load(setting_path, parse), expected)
+
+            # 壊れたblobはキャッシュに無いものとしてパースし直す
+            blob_path = Path(cache_dir) / f'{cache.key(setting_path)}.pickle'
+            blob_path.write_bytes(b'cbuiltins\nno_such_attribute\n.')
+            self.assertDictEqual(cache.load(setting_path, load_setting_file), expected)
+            self.assertDictEqual(cache.load(setting_path, parse), expected)
+
+            cache.max_bytes = 0
+            cache.evict()
+            self.assertListEqual(list(Path(cache_dir).glob('*.pickle')), [])